@@ -0,0 +1,275 @@
+# book_store.py
+"""
+Kompaktes Buchformat mit Seiten- und Lektionsindex (.book).
+
+- Seiten und Lektionen liegen als einzelne JSON-Datensätze hintereinander in der Datei
+- am Ende stehen Metadaten, eine nach Seitenzahl sortierte Offset-Tabelle der Seiten,
+  eine Tabelle der Lektionen und ein Footer mit deren Positionen
+- beim Lesen wird die Datei per mmap eingeblendet; Seite N oder Lektion K liest nur den
+  Tabelleneintrag und den eigenen Datensatz, nicht das ganze Buch
+- BookWriter schreibt Seite für Seite, die Datei erscheint erst beim Schließen (atomar)
+- open_book() liest auch die bisherigen JSON-Bücher ("pages"-Liste oder "content"-HTML)
+
+Aufbau:
+    MAGIC | Datensätze ... | Metadaten (JSON) | Seitentabelle | Lektionstabelle | Footer
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import struct
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"ARBOOK1\n"
+FOOTER_MAGIC = b"ARBKEND\n"
+# Seite: Seitenzahl, Offset, Länge des Datensatzes
+PAGE_ENTRY = struct.Struct("<IQI")
+# Lektion: erste Seite, letzte Seite, Offset, Länge des Datensatzes
+LESSON_ENTRY = struct.Struct("<IIQI")
+# Metadaten (Offset, Länge), Seitentabelle (Offset, Anzahl), Lektionstabelle (Offset, Anzahl), Magic
+FOOTER = struct.Struct("<QIQIQI8s")
+
+LESSON_HEADING = re.compile(r"<h2>(.*?)</h2>", re.S)
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class BookWriter:
+    """Schreibt ein .book inkrementell; Seiten und Lektionen landen sofort auf der Platte"""
+
+    def __init__(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.meta = dict(meta or {})
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(MAGIC)
+        self._pages: List[Tuple[int, int, int]] = []
+        self._lessons: List[Tuple[int, int, int, int]] = []
+
+    def _append(self, record: Dict[str, Any]) -> Tuple[int, int]:
+        data = _encode(record)
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset, len(data)
+
+    def add_page(self, page_number: int, content: str, **fields: Any) -> None:
+        offset, length = self._append({"pageNumber": page_number, "content": content, **fields})
+        self._pages.append((page_number, offset, length))
+
+    def add_lesson(self, title: str, first_page: int, last_page: int, content: str) -> None:
+        offset, length = self._append({"title": title, "firstPage": first_page, "lastPage": last_page, "content": content})
+        self._lessons.append((first_page, last_page, offset, length))
+
+    def close(self) -> None:
+        """Metadaten, Tabellen und Footer schreiben und die Datei an ihren Platz verschieben"""
+        if self._file.closed:
+            return
+        meta = {**self.meta, "pages": len(self._pages), "lessons": len(self._lessons)}
+        meta_offset, meta_length = self._append(meta)
+
+        pages_offset = self._file.tell()
+        for entry in sorted(self._pages):
+            self._file.write(PAGE_ENTRY.pack(*entry))
+        lessons_offset = self._file.tell()
+        for entry in self._lessons:
+            self._file.write(LESSON_ENTRY.pack(*entry))
+        self._file.write(FOOTER.pack(meta_offset, meta_length, pages_offset, len(self._pages),
+                                     lessons_offset, len(self._lessons), FOOTER_MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self) -> "BookWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class BookStore:
+    """Lesezugriff auf ein .book über mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Kein .book-Format: {path}")
+        (meta_offset, meta_length, self._pages_offset, self._page_count,
+         self._lessons_offset, self._lesson_count, magic) = FOOTER.unpack_from(self._mm, len(self._mm) - FOOTER.size)
+        if magic != FOOTER_MAGIC:
+            self._mm.close()
+            raise ValueError(f"Unvollständige .book-Datei: {path}")
+        self.meta = self._record(meta_offset, meta_length)
+
+    def _record(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(self._mm[offset:offset + length])
+
+    def _page_entry(self, index: int) -> Tuple[int, int, int]:
+        return PAGE_ENTRY.unpack_from(self._mm, self._pages_offset + index * PAGE_ENTRY.size)
+
+    def __len__(self) -> int:
+        return self._page_count
+
+    @property
+    def lesson_count(self) -> int:
+        return self._lesson_count
+
+    def page_numbers(self) -> List[int]:
+        return [self._page_entry(i)[0] for i in range(self._page_count)]
+
+    def page(self, page_number: int) -> Optional[Dict[str, Any]]:
+        """Datensatz einer Seite (binäre Suche in der Seitentabelle), None wenn es sie nicht gibt"""
+        low, high = 0, self._page_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._page_entry(middle)[0] < page_number:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._page_count:
+            number, offset, length = self._page_entry(low)
+            if number == page_number:
+                return self._record(offset, length)
+        return None
+
+    def lesson(self, number: int) -> Optional[Dict[str, Any]]:
+        """Lektion `number` (ab 1), None wenn es sie nicht gibt"""
+        if not 1 <= number <= self._lesson_count:
+            return None
+        _, _, offset, length = LESSON_ENTRY.unpack_from(self._mm, self._lessons_offset + (number - 1) * LESSON_ENTRY.size)
+        return self._record(offset, length)
+
+    def pages(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._page_count):
+            _, offset, length = self._page_entry(i)
+            yield self._record(offset, length)
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "BookStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class JsonBook:
+    """Gleiche Schnittstelle für die bisherigen JSON-Bücher (werden dafür komplett geparst)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            book = json.load(f)
+        self._pages: Dict[int, Dict[str, Any]] = {}
+        self._lessons: List[Dict[str, Any]] = []
+        if isinstance(book, list):
+            book = {"pages": book}
+
+        for number, page in enumerate(book.get("pages") or [], 1):
+            if isinstance(page, dict):
+                self._pages[page.get("pageNumber", number)] = page
+        if book.get("pages"):
+            # Bücher mit Seitenliste: jede Seite mit Titel ist eine Lektion
+            for number, page in sorted(self._pages.items()):
+                self._lessons.append({"title": page.get("title", ""), "firstPage": number,
+                                      "lastPage": number, "content": page.get("content", "")})
+        elif isinstance(book.get("content"), str):
+            # Ausgabe von process-pdf-pages-30-180.py: Lektionen stehen hintereinander im HTML
+            parts = LESSON_HEADING.split(book["content"])
+            for title, content in zip(parts[1::2], parts[2::2]):
+                self._lessons.append({"title": title.strip(), "content": f"<h2>{title}</h2>\n      {content.strip()}"})
+
+        self.meta = {key: value for key, value in book.items() if key not in ("pages", "content")}
+        self.meta.update(pages=len(self._pages), lessons=len(self._lessons))
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    @property
+    def lesson_count(self) -> int:
+        return len(self._lessons)
+
+    def page_numbers(self) -> List[int]:
+        return sorted(self._pages)
+
+    def page(self, page_number: int) -> Optional[Dict[str, Any]]:
+        return self._pages.get(page_number)
+
+    def lesson(self, number: int) -> Optional[Dict[str, Any]]:
+        return self._lessons[number - 1] if 1 <= number <= len(self._lessons) else None
+
+    def pages(self) -> Iterator[Dict[str, Any]]:
+        for number in self.page_numbers():
+            yield self._pages[number]
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "JsonBook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def open_book(path: str):
+    """BookStore für .book-Dateien, JsonBook für die bisherigen JSON-Bücher"""
+    with open(path, "rb") as f:
+        is_store = f.read(len(MAGIC)) == MAGIC
+    return BookStore(path) if is_store else JsonBook(path)
+
+def convert(source: str, target: str) -> int:
+    """JSON-Buch in das .book-Format übertragen, gibt die Anzahl der Seiten zurück"""
+    with JsonBook(source) as book, BookWriter(target, book.meta) as writer:
+        for page in book.pages():
+            fields = {key: value for key, value in page.items() if key not in ("pageNumber", "content")}
+            writer.add_page(page["pageNumber"], page.get("content", ""), **fields)
+        for number in range(1, book.lesson_count + 1):
+            lesson = book.lesson(number)
+            writer.add_lesson(lesson["title"], lesson.get("firstPage", 0), lesson.get("lastPage", 0), lesson["content"])
+        return len(book)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_parser = commands.add_parser("convert", help="JSON-Buch in .book umwandeln")
+    convert_parser.add_argument("source")
+    convert_parser.add_argument("target", nargs="?", help="Standard: gleicher Name mit .book")
+    for name in ("page", "lesson"):
+        show = commands.add_parser(name, help=f"eine {'Seite' if name == 'page' else 'Lektion'} ausgeben")
+        show.add_argument("book")
+        show.add_argument("number", type=int)
+    info = commands.add_parser("info", help="Metadaten ausgeben")
+    info.add_argument("book")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        target = args.target or os.path.splitext(args.source)[0] + ".book"
+        pages = convert(args.source, target)
+        print(f"✅ {pages} Seiten nach {target} geschrieben ({os.path.getsize(target)} Bytes)")
+        return 0
+
+    with open_book(args.book) as book:
+        if args.command == "info":
+            record = book.meta
+        elif args.command == "page":
+            record = book.page(args.number)
+        else:
+            record = book.lesson(args.number)
+        if record is None:
+            print(f"✗ {args.command} {args.number} nicht gefunden")
+            return 1
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
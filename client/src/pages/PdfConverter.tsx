@@ -15,6 +15,27 @@ interface ConversionResult {
   pages_processed?: number;
 }
 
+interface ConversionJob {
+  job_id: string;
+  state: 'queued' | 'running' | 'finished' | 'failed';
+  pages_done: number;
+  pages_total: number;
+  eta_seconds: number | null;
+  download_url: string | null;
+  error: string | null;
+}
+
+const JOB_POLL_INTERVAL_MS = 2000;
+
+// Retry-After seconds as a short wait, e.g. "40 seconds" or "3 Minuten"
+function formatWait(seconds: number, language: 'en' | 'de'): string {
+  if (seconds < 90) {
+    return language === 'de' ? `${seconds} Sekunden` : `${seconds} seconds`;
+  }
+  const minutes = Math.round(seconds / 60);
+  return language === 'de' ? `${minutes} Minuten` : `${minutes} minutes`;
+}
+
 export default function PdfConverter() {
   const [file, setFile] = useState<File | null>(null);
   const [startPage, setStartPage] = useState(30);
@@ -47,6 +68,8 @@ export default function PdfConverter() {
       success: 'PDF successfully converted!',
       download: 'Download EPUB',
       error: 'Conversion failed',
+      busy: 'The converter is busy',
+      retryIn: (seconds: number) => `Please try again in about ${formatWait(seconds, 'en')}.`,
       invalidFile: 'Please select a PDF file',
       invalidPages: 'End page must be greater than start page'
     },
@@ -70,6 +93,8 @@ export default function PdfConverter() {
       success: 'PDF erfolgreich konvertiert!',
       download: 'EPUB herunterladen',
       error: 'Konvertierung fehlgeschlagen',
+      busy: 'Der Konverter ist ausgelastet',
+      retryIn: (seconds: number) => `Bitte in etwa ${formatWait(seconds, 'de')} erneut versuchen.`,
       invalidFile: 'Bitte wählen Sie eine PDF-Datei',
       invalidPages: 'Endseite muss größer als Startseite sein'
     }
@@ -119,37 +144,61 @@ export default function PdfConverter() {
       formData.append('start_page', startPage.toString());
       formData.append('end_page', endPage.toString());
 
-      // Simulate progress
-      const progressInterval = setInterval(() => {
-        setProgress(prev => {
-          if (prev >= 90) {
-            clearInterval(progressInterval);
-            return prev;
-          }
-          return prev + Math.random() * 15;
-        });
-      }, 1000);
-
       const response = await fetch('/api/pdf-convert', {
         method: 'POST',
         body: formData
       });
 
-      clearInterval(progressInterval);
-      setProgress(100);
+      const started = await response.json();
+      if (!response.ok) {
+        // Busy server (429, or 503 when the queue is full): say when to come back
+        const retryAfter = Number(response.headers.get('Retry-After'));
+        if (retryAfter > 0) {
+          toast({
+            title: t.busy,
+            description: t.retryIn(retryAfter),
+            variant: 'destructive'
+          });
+          setResult({ success: false, message: `${t.busy}. ${t.retryIn(retryAfter)}` });
+          return;
+        }
+        throw new Error(started.error || 'Conversion failed');
+      }
 
-      if (response.ok) {
-        const result: ConversionResult = await response.json();
-        setResult(result);
-        
-        toast({
-          title: t.success,
-          description: `${result.pages_processed} ${language === 'de' ? 'Seiten verarbeitet' : 'pages processed'}`,
-        });
-      } else {
-        const error = await response.json();
-        throw new Error(error.error || 'Conversion failed');
+      // Poll the background job until it has finished; an already converted
+      // PDF comes back with its download URL straight away
+      let job: ConversionJob | null = null;
+      if (!started.download_url) {
+        do {
+          await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+          const statusResponse = await fetch(started.status_url);
+          job = await statusResponse.json() as ConversionJob;
+          if (!statusResponse.ok) {
+            throw new Error((job as any).error || 'Conversion failed');
+          }
+          if (job.pages_total > 0) {
+            setProgress(Math.min(100, (job.pages_done / job.pages_total) * 100));
+          }
+        } while (job.state === 'queued' || job.state === 'running');
+
+        if (job.state === 'failed') {
+          throw new Error(job.error || 'Conversion failed');
+        }
       }
+
+      setProgress(100);
+      const result: ConversionResult = {
+        success: true,
+        message: t.success,
+        download_url: started.download_url ?? job?.download_url ?? undefined,
+        pages_processed: job ? job.pages_done : started.pages_total
+      };
+      setResult(result);
+
+      toast({
+        title: t.success,
+        description: `${result.pages_processed} ${language === 'de' ? 'Seiten verarbeitet' : 'pages processed'}`,
+      });
     } catch (error) {
       console.error('Conversion error:', error);
       toast({
@@ -1,19 +1,204 @@
 # extract_vocab.py
+"""
+Wortindex über alle Bücher in books/ (HTML, JSON mit Seiten, Markdown, .book).
+
+- Dateien werden zeilen- bzw. seitenweise gelesen und parallel verarbeitet
+- Wörter werden normalisiert (ohne Tashkeel, einheitliche Alif/Ya/Ta-marbuta-Formen) gezählt,
+  mit Vorkommen pro Buch und Seite
+- nur neue oder geänderte Dateien werden neu eingelesen, der Rest kommt aus corpus_index.json
+- unique_words.txt enthält danach alle vorkommenden Wortformen (Eingabe für generate_vocab.py)
+"""
+import os
 import re
+import sys
+import html
+import json
+import hashlib
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Normalisierung wie im PDF-Konverter, damit Index und Vokabular dieselben Schlüssel benutzen
+sys.path.insert(0, str(Path(__file__).resolve().parent / "pdf_converter"))
+from vocabulary import normalize_arabic
+from book_store import BookStore
+
+INDEX_VERSION = 1
+BOOK_SUFFIXES = {".html", ".htm", ".json", ".md", ".book"}
+
+# Arabische Buchstaben samt Tashkeel und Tatweel (ohne Satzzeichen wie ، oder ؟)
+ARABIC_WORD = re.compile(r"[\u0621-\u063A\u0640-\u065F\u0670-\u06D3]+")
+HTML_TAG = re.compile(r"<[^>]*>")
+HTML_PAGE_START = re.compile(r"""<div\b[^>]*\bclass=["']page["']""")
+SKIPPED_ELEMENT = re.compile(r"<(script|style)\b.*?</\1>", re.S)
+SKIPPED_START = re.compile(r"<(script|style)\b")
+SKIPPED_END = re.compile(r"</(script|style)>")
+MD_PAGE_HEADING = re.compile(r"^#+\s*(?:Seite|Page|صفحة)\s*(\d+)", re.I)
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def html_pages(path: Path) -> Iterator[Tuple[int, str]]:
+    """(Seite, Text) je Zeile; jedes <div class="page"> beginnt eine neue Seite"""
+    page = 1
+    seen_page = False
+    in_skipped = False
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            # <script>/<style> überspringen, auch über mehrere Zeilen
+            if in_skipped:
+                if SKIPPED_END.search(line):
+                    in_skipped = False
+                continue
+            line = SKIPPED_ELEMENT.sub(" ", line)
+            start = SKIPPED_START.search(line)
+            if start:
+                in_skipped = True
+                line = line[:start.start()]
+            for _ in HTML_PAGE_START.finditer(line):
+                page = page + 1 if seen_page else 1
+                seen_page = True
+            yield page, html.unescape(HTML_TAG.sub(" ", line))
+
+def json_pages(path: Path) -> Iterator[Tuple[int, str]]:
+    """(Seite, Text) für JSON-Bücher mit "pages": [{"pageNumber", "title", "content"}, ...]"""
+    with open(path, encoding="utf-8") as f:
+        book = json.load(f)
+    pages = book.get("pages", []) if isinstance(book, dict) else book
+    for number, page in enumerate(pages, 1):
+        if not isinstance(page, dict):
+            continue
+        page_number = page.get("pageNumber", number)
+        for field in ("title", "content"):
+            text = page.get(field)
+            if isinstance(text, str):
+                yield page_number, html.unescape(HTML_TAG.sub(" ", text))
+
+def markdown_pages(path: Path) -> Iterator[Tuple[int, str]]:
+    """(Seite, Text) für Markdown; Überschriften wie "## Seite 12" beginnen eine Seite"""
+    page = 1
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            heading = MD_PAGE_HEADING.match(line)
+            if heading:
+                page = int(heading.group(1))
+            yield page, line
+
+def store_pages(path: Path) -> Iterator[Tuple[int, str]]:
+    """(Seite, Text) aus dem indizierten .book-Format (book_store.py)"""
+    with BookStore(str(path)) as book:
+        for page in book.pages():
+            for field in ("title", "content"):
+                text = page.get(field)
+                if isinstance(text, str):
+                    yield page["pageNumber"], html.unescape(HTML_TAG.sub(" ", text))
+
+READERS = {".html": html_pages, ".htm": html_pages, ".json": json_pages, ".md": markdown_pages, ".book": store_pages}
+
+def scan_book(path: str) -> Dict:
+    """Alle Wörter eines Buchs: Häufigkeit je normalisiertem Wort, Seiten und Wortformen"""
+    path = Path(path)
+    pages: Dict[str, Counter] = defaultdict(Counter)
+    forms: Dict[str, Counter] = defaultdict(Counter)
+    tokens = 0
+    for page, text in READERS[path.suffix.lower()](path):
+        for match in ARABIC_WORD.finditer(text):
+            form = match.group()
+            key = normalize_arabic(form)
+            if not key:
+                continue
+            pages[key][page] += 1
+            forms[key][form] += 1
+            tokens += 1
+    return {
+        "tokens": tokens,
+        "words": {
+            key: {
+                "count": sum(counts.values()),
+                "pages": sorted([p, c] for p, c in counts.items()),
+                "forms": dict(forms[key]),
+            }
+            for key, counts in pages.items()
+        },
+    }
+
+def load_index(path: str) -> Dict:
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    return {"version": INDEX_VERSION, "files": {}, "words": {}}
+
+def build_words(files: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Gesamtindex aus den Ergebnissen je Datei: Häufigkeit, Formen und Vorkommen je Buch/Seite"""
+    words: Dict[str, Dict] = {}
+    for name, scanned in sorted(files.items()):
+        book = Path(name).stem
+        for key, entry in scanned["words"].items():
+            word = words.setdefault(key, {"count": 0, "forms": {}, "books": {}})
+            word["count"] += entry["count"]
+            for form, count in entry["forms"].items():
+                word["forms"][form] = word["forms"].get(form, 0) + count
+            word["books"][book] = {"count": entry["count"], "pages": entry["pages"]}
+    return dict(sorted(words.items(), key=lambda item: (-item[1]["count"], item[0])))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", default="books", help="Ordner mit den Büchern")
+    parser.add_argument("--index", default="corpus_index.json")
+    parser.add_argument("--words", default="unique_words.txt", help="Liste aller Wortformen")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    index = load_index(args.index)
+    book_files = sorted(p for p in Path(args.books).iterdir() if p.suffix.lower() in BOOK_SUFFIXES)
+
+    # Nur Dateien neu einlesen, deren Inhalt sich geändert hat
+    files, changed = {}, []
+    for path in book_files:
+        name = str(path)
+        stat = path.stat()
+        cached = index["files"].get(name)
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+            files[name] = cached
+            continue
+        digest = file_sha256(path)
+        if cached and cached["sha256"] == digest:
+            cached["mtime"] = stat.st_mtime
+            files[name] = cached
+            continue
+        files[name] = {"sha256": digest, "size": stat.st_size, "mtime": stat.st_mtime}
+        changed.append(name)
 
-# Pfad zu deinem Buch
-BOOK_PATH = "books/qiraatu al rashida.md"
+    print(f"{len(book_files)} Bücher, {len(changed)} neu oder geändert")
+    if changed:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(changed)))) as pool:
+            for name, scanned in zip(changed, pool.map(scan_book, changed)):
+                files[name].update(scanned)
+                print(f"  {name}: {scanned['tokens']} Wörter, {len(scanned['words'])} verschiedene")
 
-with open(BOOK_PATH, encoding="utf-8") as f:
-    text = f.read()
+    index["files"] = files
+    index["words"] = build_words(files)
+    tmp_path = f"{args.index}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        json.dump(index, out, ensure_ascii=False)
+    os.replace(tmp_path, args.index)
 
-# Alle arabischen Wörter extrahieren, Duplikate rausfiltern und sortieren
-words = re.findall(r"[\u0600-\u06FF]+", text)
-unique = sorted(set(words))
+    # Alle Wortformen sortiert in unique_words.txt speichern
+    unique = sorted({form for word in index["words"].values() for form in word["forms"]})
+    with open(args.words, "w", encoding="utf-8") as out:
+        for w in unique:
+            out.write(w + "\n")
 
-# In unique_words.txt speichern
-with open("unique_words.txt", "w", encoding="utf-8") as out:
-    for w in unique:
-        out.write(w + "\n")
+    print(f"✅ {len(index['words'])} normalisierte Wörter in {args.index}, {len(unique)} Wortformen in {args.words}")
+    return 0
 
-print(f"✅ {len(unique)} Wörter in unique_words.txt")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,174 @@
-import re
+"""
+Deutsche Übersetzungen für alle Wörter aus unique_words.txt erzeugen und in vocab.md schreiben.
+
+- mehrere Wörter pro Anfrage, mehrere Anfragen gleichzeitig (begrenzt)
+- Übersetzungen landen sofort im Cache (vocab_cache.jsonl), ein neuer Lauf übersetzt nur neue Wörter
+- fehlgeschlagene Anfragen werden mit wachsender Wartezeit wiederholt
+- vocab.md wird nach jedem fertigen Batch fortgeschrieben
+
+Für Tests ohne OpenAI: --base-url auf einen lokalen, OpenAI-kompatiblen Stub-Server zeigen lassen.
+"""
 import os
-from openai import OpenAI
-
-# Deinen API-Key als Umgebungsvariable in Replit anlegen: OPENAI_API_KEY
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-
-# Hier den Dateinamen anpassen, falls dein Buch z.B. qiraatu al rashida.md heißt
-with open("books/qiraatu al rashida.md", encoding="utf-8") as f:
-    text = f.read()
-
-# Alle arabischen Wörter extrahieren, Duplikate rausfiltern
-words = re.findall(r"[\u0600-\u06FF]+", text)
-unique = list(dict.fromkeys(words))
-
-# Deutsche Übersetzungen abfragen und als Markdown bauen
-entries = []
-for w in unique:
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role":"user","content":f"Übersetze dieses arabische Wort ins Deutsche: «{w}»"}]
-    )
-    de = resp.choices[0].message.content.strip()
-    entries.append((w, de))
-
-# Ergebnis in vocab.md speichern
-with open("vocab.md", "w", encoding="utf-8") as out:
-    for ar, de in entries:
+import re
+import sys
+import json
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# vocab.md wird so gelesen wie vom PDF-Konverter, der die Übersetzungen später einsetzt
+sys.path.insert(0, str(Path(__file__).resolve().parent / "pdf_converter"))
+from vocabulary import parse_vocab_md
+
+ARABIC_WORD = re.compile(r"[\u0600-\u06FF]+")
+
+PROMPT = (
+    "Übersetze die folgenden arabischen Wörter ins Deutsche. "
+    "Antworte nur mit einem JSON-Objekt, das jedes Wort exakt wie angegeben auf seine "
+    "kurze deutsche Übersetzung abbildet.\n\n{words}"
+)
+
+def read_words(path: str) -> List[str]:
+    """Eindeutige arabische Wörter in Reihenfolge: eine Zeile pro Wort (.txt) oder aus Fließtext"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".txt"):
+        candidates = (line.split("\t")[0].strip() for line in text.splitlines())
+        words = [w for w in candidates if ARABIC_WORD.fullmatch(w)]
+    else:
+        words = ARABIC_WORD.findall(text)
+    return list(dict.fromkeys(words))
+
+def read_vocab_md(path: str) -> List[Tuple[str, str]]:
+    """Vorhandene Einträge aus vocab.md: arabische Zeile, deutsche Zeile, Leerzeile"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return list(parse_vocab_md(f))
+
+class TranslationCache:
+    """Wort -> Übersetzung, als JSON-Zeilen angehängt, damit ein Abbruch nichts verliert"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # halb geschriebene letzte Zeile
+                    self.entries[entry["ar"]] = entry["de"]
+
+    def add(self, translations: Dict[str, str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for ar, de in translations.items():
+                self.entries[ar] = de
+                f.write(json.dumps({"ar": ar, "de": de}, ensure_ascii=False) + "\n")
+
+class OpenAITranslator:
+    """Übersetzt ein Batch Wörter mit einer Chat-Completion-Anfrage (OpenAI oder kompatibler Server)"""
+
+    def __init__(self, model: str, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        from openai import AsyncOpenAI
+
+        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=api_key or os.environ.get("OPENAI_API_KEY", "stub"),
+            base_url=base_url or os.environ.get("OPENAI_BASE_URL"),
+        )
+
+    async def translate(self, words: List[str]) -> Dict[str, str]:
+        resp = await self.client.chat.completions.create(
+            model=self.model,
+            response_format={"type": "json_object"},
+            messages=[{"role": "user", "content": PROMPT.format(words="\n".join(words))}],
+        )
+        result = json.loads(resp.choices[0].message.content)
+        return {w: str(result[w]).strip() for w in words if result.get(w)}
+
+async def translate_with_retry(translator, words: List[str], retries: int) -> Dict[str, str]:
+    """Anfrage mit exponentiellem Backoff (1s, 2s, 4s, ... plus Zufall) wiederholen"""
+    for attempt in range(retries + 1):
+        try:
+            return await translator.translate(words)
+        except Exception as e:
+            if attempt == retries:
+                print(f"✗ Batch ab «{words[0]}» aufgegeben: {e}")
+                return {}
+            delay = 2 ** attempt + random.random()
+            print(f"  Fehler ({e}), neuer Versuch in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    return {}
+
+def batches(words: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(words), size):
+        yield words[start:start + size]
+
+async def generate(args, translator) -> int:
+    words = read_words(args.input)
+    cache = TranslationCache(args.cache)
+
+    # Einträge, die schon in vocab.md stehen, bleiben erhalten und werden nicht neu übersetzt
+    existing = read_vocab_md(args.output)
+    known = {ar for ar, _ in existing}
+    for ar, de in existing:
+        cache.entries.setdefault(ar, de)
+    todo = [w for w in words if w not in cache.entries]
+    print(f"{len(words)} Wörter, {len(words) - len(todo)} bereits übersetzt, {len(todo)} neu")
+
+    # vocab.md neu schreiben und danach Batch für Batch ergänzen
+    out = open(args.output, "w", encoding="utf-8")
+    written = 0
+    for ar, de in existing + [(w, cache.entries[w]) for w in words if w in cache.entries and w not in known]:
         out.write(f"{ar}\n{de}\n\n")
+        written += 1
+    out.flush()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    done = 0
+
+    async def run(batch: List[str]) -> None:
+        nonlocal done, written
+        async with semaphore:
+            translations = await translate_with_retry(translator, batch, args.retries)
+        cache.add(translations)
+        for ar in batch:
+            if ar in translations:
+                out.write(f"{ar}\n{translations[ar]}\n\n")
+                written += 1
+        out.flush()
+        done += len(translations)
+        print(f"  {done}/{len(todo)} übersetzt")
+
+    try:
+        await asyncio.gather(*(run(batch) for batch in batches(todo, args.batch_size)))
+    finally:
+        out.close()
+
+    missing = len(todo) - done
+    print(f"✅ {written} Vokabeln in {args.output} geschrieben.")
+    if missing:
+        print(f"✗ {missing} Wörter ohne Übersetzung, ein neuer Lauf versucht nur diese erneut.")
+    return 1 if missing else 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="unique_words.txt", help="Wortliste (.txt) oder Buchtext")
+    parser.add_argument("--output", default="vocab.md")
+    parser.add_argument("--cache", default="vocab_cache.jsonl")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--base-url", help="OpenAI-kompatibler Server, z.B. ein lokaler Stub (Standard: OPENAI_BASE_URL)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Wörter pro Anfrage")
+    parser.add_argument("--concurrency", type=int, default=4, help="gleichzeitige Anfragen")
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    translator = OpenAITranslator(args.model, args.base_url)
+    return asyncio.run(generate(args, translator))
 
-print(f"✅ {len(entries)} Vokabeln in vocab.md geschrieben.")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Admission control for conversion jobs
+Estimates what a job costs from its pages, dpi and workers and keeps the server within
+global budgets: too much queued work is rejected (429), jobs wait for memory before they start
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from jobs import RUNNING, Job
+
+logger = logging.getLogger(__name__)
+
+# A4 in inches, the size of the pages in the readers this service converts
+PAGE_INCHES = (8.27, 11.69)
+# Converter, EPUB writer and vocabulary in the server process
+PROCESS_MB = 50
+# Python, OpenCV and Tesseract with the Arabic model in each OCR process
+WORKER_MB = 150
+
+def estimate_cost(pages: int, dpi: int, workers: int, window_size: int) -> Dict[str, Any]:
+    """Pages and estimated peak memory (MB) of a conversion
+
+    A rendered page is an RGB bitmap; the serial path keeps a render window of them, the
+    parallel path up to twice the workers in flight, and every OCR process holds its page
+    plus the preprocessing buffers.
+    """
+    page_mb = PAGE_INCHES[0] * dpi * PAGE_INCHES[1] * dpi * 3 / (1024 * 1024)
+    workers = max(1, workers)
+    in_flight = window_size if workers == 1 else max(window_size, 2 * workers)
+    memory_mb = PROCESS_MB + in_flight * page_mb + workers * (WORKER_MB + 2 * page_mb)
+    return {'pages': pages, 'dpi': dpi, 'workers': workers, 'memory_mb': int(round(memory_mb))}
+
+def _pages_left(job: Job) -> int:
+    pages = (job.cost or {}).get('pages', job.pages_total)
+    return max(pages - (job.pages_done or 0), 0)
+
+def _memory(job: Job) -> int:
+    return (job.cost or {}).get('memory_mb', 0)
+
+class AdmissionError(Exception):
+    """A conversion the server does not take: now (429 with retry_after seconds) or at all (400)"""
+
+    def __init__(self, message: str, status: int = 429, retry_after: Optional[int] = None, reason: str = 'budget'):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+class AdmissionController:
+    """Global budgets for queued pages and running memory, shared by all jobs of a server
+
+    max_pages bounds the pages of all queued and running jobs (the backlog), max_memory_mb
+    the estimated memory of the running ones. With a job store the jobs of the other server
+    processes count as well; the budgets are then checked without a cross-process lock,
+    so two processes admitting at the same moment can overshoot by one job.
+    """
+
+    def __init__(self, max_pages: int = 1000, max_memory_mb: int = 4096, max_job_pages: int = 500,
+                 seconds_per_page: float = 3.0, poll_interval: float = 1.0):
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.max_job_pages = max_job_pages
+        # Conversion speed for Retry-After, updated from the jobs finished in this process
+        self.seconds_per_page = seconds_per_page
+        # Other processes cannot wake a waiting job, so the memory check is repeated this often
+        self.poll_interval = poll_interval
+
+        self._running: Dict[str, int] = {}
+        self._condition = threading.Condition()
+
+    def check_range(self, start_page: int, end_page: int) -> None:
+        """Reject page ranges that are invalid or larger than a single job may be"""
+        if start_page < 1:
+            raise AdmissionError('Die Startseite muss mindestens 1 sein', 400, reason='range')
+        if end_page < start_page:
+            raise AdmissionError('Die Endseite darf nicht vor der Startseite liegen', 400, reason='range')
+        if end_page - start_page + 1 > self.max_job_pages:
+            raise AdmissionError(f'Höchstens {self.max_job_pages} Seiten pro Konvertierung', 400, reason='range')
+
+    def check_job(self, cost: Dict[str, Any]) -> None:
+        """Reject a job that would not fit the memory budget even on an idle server"""
+        if cost['memory_mb'] > self.max_memory_mb:
+            raise AdmissionError(
+                f"Konvertierung braucht etwa {cost['memory_mb']} MB, erlaubt sind {self.max_memory_mb} MB; "
+                f"bitte weniger Worker oder eine niedrigere Auflösung wählen", 400, reason='memory')
+
+    def admit(self, job: Job, active: Iterable[Job]) -> None:
+        """Raise AdmissionError (429) if the job does not fit next to the queued and running jobs"""
+        backlog = sum(_pages_left(other) for other in active)
+        excess = backlog + _pages_left(job) - self.max_pages
+        if excess > 0:
+            raise AdmissionError('Server ausgelastet, bitte später erneut versuchen',
+                                 retry_after=self.retry_after(excess), reason='pages')
+
+    def retry_after(self, excess_pages: int) -> int:
+        """Seconds until the backlog has shrunk by excess_pages at the current speed"""
+        return int(min(max(excess_pages * self.seconds_per_page, 5), 900))
+
+    def wait_to_start(self, job: Job, others_running: Callable[[], List[Job]]) -> float:
+        """Block until the job's memory fits next to the running jobs; returns the seconds waited
+
+        A job always starts when nothing else is running, so an estimate that is off
+        cannot stall the queue.
+        """
+        needed = _memory(job)
+        started = time.time()
+        with self._condition:
+            while True:
+                others = others_running()
+                used = sum(self._running.values()) + sum(_memory(other) for other in others)
+                if used + needed <= self.max_memory_mb or (not self._running and not others):
+                    self._running[job.id] = needed
+                    break
+                self._condition.wait(self.poll_interval)
+        waited = time.time() - started
+        if waited >= self.poll_interval:
+            logger.info(f"Job {job.id} waited {waited:.1f}s for {needed} MB of memory")
+        return waited
+
+    def finished(self, job: Job) -> None:
+        """Free the job's memory and learn the conversion speed from it"""
+        with self._condition:
+            self._running.pop(job.id, None)
+            self._condition.notify_all()
+        if job.started_at and job.finished_at and job.pages_done:
+            seconds = (job.finished_at - job.started_at) / job.pages_done
+            self.seconds_per_page = 0.7 * self.seconds_per_page + 0.3 * seconds
+
+    def usage(self, active: Iterable[Job]) -> Dict[str, Any]:
+        """Current use of the budgets, for /status"""
+        active = list(active)
+        running = [job for job in active if job.state == RUNNING]
+        return {
+            'pages': {'used': sum(_pages_left(job) for job in active), 'budget': self.max_pages},
+            'memory_mb': {'used': sum(_memory(job) for job in running), 'budget': self.max_memory_mb},
+            'jobs': {'queued': len(active) - len(running), 'running': len(running)},
+            'max_job_pages': self.max_job_pages,
+            'seconds_per_page': round(self.seconds_per_page, 2),
+        }
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Headless batch conversion
+Converts every PDF and page range of a manifest over one shared pool of OCR workers, no HTTP server involved
+
+Manifest: a JSON list (or {"jobs": [...]}) of {"pdf": ..., "start_page": 30, "end_page": 180, "output": ...}
+entries, or a text file with one "path/to/book.pdf 30-180 [output.epub]" per line.
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from jobs import FAILED, FINISHED, RUNNING, Job
+from main import PDFToEpubConverter, _init_ocr_worker, clamp_worker_count, default_worker_count
+
+logger = logging.getLogger('batch_convert')
+
+def read_manifest(path: str, output_dir: str) -> List[Job]:
+    """Conversions listed in a manifest, as jobs with the output path filled in"""
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    entries = []
+    if path.endswith('.json'):
+        manifest = json.loads(content)
+        entries = manifest.get('jobs', []) if isinstance(manifest, dict) else manifest
+    else:
+        for line in content.splitlines():
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            entry: Dict[str, Any] = {'pdf': fields[0]}
+            if len(fields) > 1:
+                first, _, last = fields[1].partition('-')
+                entry['start_page'] = int(first)
+                entry['end_page'] = int(last or first)
+            if len(fields) > 2:
+                entry['output'] = fields[2]
+            entries.append(entry)
+
+    jobs = []
+    for entry in entries:
+        pdf_path = os.path.join(base_dir, entry['pdf'])
+        start_page = int(entry.get('start_page', 30))
+        end_page = int(entry.get('end_page', 180))
+        if start_page < 1 or end_page < start_page:
+            raise ValueError(f"Invalid page range {start_page}-{end_page} for {entry['pdf']}")
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        # Paths in the manifest are relative to the manifest, --output-dir to the working directory
+        if entry.get('output'):
+            epub_path = os.path.join(base_dir, entry['output'])
+        else:
+            epub_path = os.path.join(output_dir, f"{stem}_pages_{start_page}-{end_page}.epub")
+        jobs.append(Job(pdf_path, epub_path, start_page, end_page))
+    return jobs
+
+class BatchProgress:
+    """Pages done across all jobs, printed as a live pages/sec line"""
+
+    def __init__(self, jobs: List[Job], interval: float = 2.0, stream=sys.stderr):
+        self.jobs = jobs
+        self.interval = interval
+        self.stream = stream
+        self.started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='batch-progress', daemon=True)
+        self._last_pages = 0
+        self._last_time = self.started
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.print_line(final=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.print_line()
+
+    def print_line(self, final: bool = False) -> None:
+        now = time.perf_counter()
+        pages = sum(job.pages_done for job in self.jobs)
+        total = sum(job.pages_total for job in self.jobs)
+        elapsed = now - self.started
+        # Current rate over the last interval, average over the whole run
+        current = (pages - self._last_pages) / (now - self._last_time) if now > self._last_time else 0.0
+        average = pages / elapsed if elapsed > 0 else 0.0
+        self._last_pages, self._last_time = pages, now
+        counts = {state: sum(1 for job in self.jobs if job.state == state) for state in (RUNNING, FINISHED, FAILED)}
+        line = (f"[{elapsed:7.1f}s] {pages}/{total} pages | {current:.2f} pages/s now, {average:.2f} avg | "
+                f"{counts[RUNNING]} running, {counts[FINISHED]} done, {counts[FAILED]} failed")
+        if self.stream.isatty() and not final:
+            self.stream.write('\r' + line)
+        else:
+            self.stream.write(('\r' if self.stream.isatty() else '') + line + '\n')
+        self.stream.flush()
+
+def convert_job(job: Job, executor: ProcessPoolExecutor, skip_existing: bool) -> None:
+    """Convert one manifest entry on a batch thread, sending its pages to the shared pool"""
+    job.started_at = time.time()
+    job.state = RUNNING
+    if skip_existing and os.path.exists(job.epub_path):
+        job.pages_done = job.pages_total
+        job.result = {'skipped': True}
+        job.state = FINISHED
+        job.finished_at = time.time()
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(job.epub_path)), exist_ok=True)
+    converter = PDFToEpubConverter(job.start_page, job.end_page, executor=executor)
+    # A book with pages that failed OCR goes next to the target, so --skip-existing retries it
+    stem, extension = os.path.splitext(job.epub_path)
+    incomplete_path = f"{stem}_incomplete{extension}"
+    try:
+        success = converter.create_epub_book(job.pdf_path, job.epub_path, job.update_progress,
+                                             incomplete_path=incomplete_path)
+    except Exception as e:
+        logger.error(f"{job.pdf_path}: {e}")
+        job.error = str(e)
+        success = False
+    job.result = {'throughput': converter.stats}
+    job.state = FINISHED if success else FAILED
+    if not success and not job.error:
+        job.error = 'conversion failed'
+    if success and converter.stats.get('failed_pages'):
+        job.epub_path = incomplete_path
+        job.error = f"{converter.stats['failed_pages']} pages failed OCR"
+    job.finished_at = time.time()
+
+def job_summary(job: Job) -> Dict[str, Any]:
+    seconds = (job.finished_at or time.time()) - (job.started_at or job.created_at)
+    throughput = job.result.get('throughput', {})
+    pages = throughput.get('pages', 0)
+    return {
+        'pdf': job.pdf_path,
+        'pages': [job.start_page, job.end_page],
+        'output': job.epub_path,
+        'state': job.state,
+        'error': job.error,
+        'skipped': job.result.get('skipped', False),
+        # Finished, but with empty pages where OCR failed
+        'incomplete': throughput.get('failed_pages', 0) > 0,
+        'seconds': round(seconds, 3),
+        'pages_converted': pages,
+        'pages_per_second': round(pages / seconds, 3) if seconds > 0 and pages else 0.0,
+        'throughput': throughput,
+    }
+
+def run_batch(jobs: List[Job], workers: int, concurrency: int, skip_existing: bool = False,
+              interval: float = 2.0) -> Dict[str, Any]:
+    """Run all jobs, at most `concurrency` at a time, over one pool of `workers` OCR processes"""
+    started_at = datetime.now(timezone.utc).isoformat()
+    started = time.perf_counter()
+    progress = BatchProgress(jobs, interval)
+
+    # One pool for the whole batch: each worker loads its OCR engine once and keeps it
+    # for every page of every book
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker) as executor:
+        progress.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch') as threads:
+                for future in [threads.submit(convert_job, job, executor, skip_existing) for job in jobs]:
+                    future.result()
+        finally:
+            progress.stop()
+
+    wall_seconds = time.perf_counter() - started
+    entries = [job_summary(job) for job in jobs]
+    pages = sum(entry['pages_converted'] for entry in entries)
+    return {
+        'started_at': started_at,
+        'workers': workers,
+        'concurrency': concurrency,
+        'jobs': len(jobs),
+        'finished': sum(1 for entry in entries if entry['state'] == FINISHED and not entry['incomplete']),
+        'failed': sum(1 for job in jobs if job.state == FAILED),
+        'incomplete': sum(1 for entry in entries if entry['incomplete']),
+        'pages': pages,
+        'wall_seconds': round(wall_seconds, 3),
+        'pages_per_second': round(pages / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        'entries': entries,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', help='JSON manifest or text file with one "pdf start-end [output]" per line')
+    parser.add_argument('--output-dir', default='output', help='where EPUBs without an explicit output go')
+    parser.add_argument('--workers', type=int, help='OCR worker processes (default: PDF_OCR_WORKERS)')
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help='manifest entries converted at the same time, all sharing the workers')
+    parser.add_argument('--summary', default='batch_summary.json', help='where to write the throughput summary')
+    parser.add_argument('--skip-existing', action='store_true', help='leave entries whose EPUB already exists')
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between progress lines')
+    parser.add_argument('--verbose', action='store_true', help='log every page')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    try:
+        jobs = read_manifest(args.manifest, args.output_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"✗ Invalid manifest {args.manifest}: {e}", file=sys.stderr)
+        return 2
+    missing = [job.pdf_path for job in jobs if not os.path.exists(job.pdf_path)]
+    if missing:
+        print(f"✗ PDFs not found: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    workers = clamp_worker_count(args.workers) if args.workers else default_worker_count()
+    print(f"Converting {len(jobs)} PDFs with {workers} OCR workers, {args.concurrency} at a time")
+    summary = run_batch(jobs, workers, min(args.concurrency, len(jobs)) or 1, args.skip_existing, args.interval)
+
+    with open(args.summary, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    for entry in summary['entries']:
+        if entry['state'] != FINISHED:
+            mark = '✗'
+        else:
+            mark = '!' if entry['incomplete'] else '✓'
+        print(f"  {mark} {entry['output']}: {entry['pages_converted']} pages in {entry['seconds']}s"
+              + (f" ({entry['error']})" if entry['error'] else ''))
+    print(f"{summary['pages']} pages in {summary['wall_seconds']}s ({summary['pages_per_second']} pages/s), "
+          f"summary written to {args.summary}")
+    if summary['incomplete']:
+        print(f"⚠ {summary['incomplete']} EPUBs are incomplete: pages that failed OCR are empty, "
+              f"rerun the manifest to retry them", file=sys.stderr)
+    return 1 if summary['failed'] or summary['incomplete'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the PDF to EPUB converter
+Runs offline on synthetic Arabic pages, no PDF or network needed
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from PIL import Image, ImageDraw, ImageFont
+import arabic_reshaper
+from bidi.algorithm import get_display
+
+# Sentences in the style of the Qira'a reader, used to fill synthetic pages
+SAMPLE_LINES = [
+    'ذَهَبَ الوَلَدُ إِلَى المَدْرَسَةِ فِي الصَّبَاحِ البَاكِرِ',
+    'قَرَأَ التِّلْمِيذُ الكِتَابَ وَكَتَبَ الدَّرْسَ فِي الدَّفْتَرِ',
+    'فِي البَيْتِ حَدِيقَةٌ جَمِيلَةٌ فِيهَا أَشْجَارٌ وَأَزْهَارٌ',
+    'شَرِبَ الطِّفْلُ المَاءَ وَأَكَلَ الطَّعَامَ ثُمَّ نَامَ',
+    'كَانَ الرَّجُلُ كَرِيمًا رَحِيمًا بِالنَّاسِ',
+    'يَسْتَيْقِظُ أَحْمَدُ مُبَكِّرًا وَيَسْتَعِدُّ لِلذَّهَابِ إِلَى المَسْجِدِ',
+]
+
+FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+]
+
+# A4 at 300 dpi
+PAGE_SIZE = (2480, 3508)
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    """First available font with Arabic glyphs, PIL's default font otherwise"""
+    for path in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+def synthetic_page(page_num: int, size=PAGE_SIZE, lines: int = 24) -> Image.Image:
+    """Render a page of Arabic text with wide margins, like a scanned reader page"""
+    width, height = size
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    font = load_font(max(12, height // 60))
+
+    margin_x = width // 8
+    line_height = (height - 2 * (height // 10)) // lines
+    y = height // 10
+    for i in range(lines):
+        line = SAMPLE_LINES[(page_num + i) % len(SAMPLE_LINES)]
+        # PIL without libraqm does not shape Arabic, so draw the visual form
+        visual = get_display(arabic_reshaper.reshape(line))
+        text_width = draw.textlength(visual, font=font)
+        draw.text((width - margin_x - text_width, y), visual, fill='black', font=font)
+        y += line_height
+
+    return image
+
+def synthetic_pages(count: int, size=PAGE_SIZE) -> List[Image.Image]:
+    return [synthetic_page(page_num, size) for page_num in range(count)]
+
+def synthetic_text(page_num: int, lines: int = 24) -> str:
+    """Text of a synthetic page as extract_text_from_image returns it (reshaped, visual order)"""
+    return '\n'.join(
+        get_display(arabic_reshaper.reshape(SAMPLE_LINES[(page_num + i) % len(SAMPLE_LINES)]))
+        for i in range(lines)
+    )
+
+def dense_text(page_num: int, tokens: int) -> str:
+    """Page text with the given number of words, for pages far denser than a reader page"""
+    words = ' '.join(SAMPLE_LINES).split()
+    lines = []
+    for start in range(0, tokens, 12):
+        line = [words[(page_num + i) % len(words)] for i in range(start, min(start + 12, tokens))]
+        lines.append(get_display(arabic_reshaper.reshape(' '.join(line))))
+    return '\n'.join(lines)
+
+def synthetic_pdf(path: str, pages: int, size=PAGE_SIZE) -> str:
+    """Write a scanned-style PDF of synthetic pages at 300 dpi"""
+    images = synthetic_pages(pages, size)
+    images[0].save(path, 'PDF', resolution=300.0, save_all=True, append_images=images[1:])
+    return path
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+def _report(name: str, pages: int, seconds: float) -> Dict[str, Any]:
+    result = {
+        'name': name,
+        'pages': pages,
+        'seconds': round(seconds, 3),
+        'pages_per_second': round(pages / seconds, 3) if seconds > 0 else 0.0,
+    }
+    print(f"  {name:<32} {pages:>4} pages  {seconds:8.2f}s  {result['pages_per_second']:8.2f} pages/s")
+    return result
+
+def bench_ocr_backends(pages: int, backends: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Compare pages/sec of the OCR backends on identical preprocessed pages"""
+    from main import PDFToEpubConverter
+    from ocr_backends import create_backend
+
+    converter = PDFToEpubConverter(ocr_cache_dir='')
+    # Copy the arrays, the pipeline reuses its buffers for the next page
+    processed = [converter.preprocess_image(image).copy() for image in synthetic_pages(pages)]
+
+    print(f"OCR backends ({pages} pages, {converter.ocr_config})")
+    results = []
+    for name in backends or ['tesserocr', 'pytesseract']:
+        try:
+            started = time.perf_counter()
+            backend = create_backend(name, converter.ocr_config)
+            startup = time.perf_counter() - started
+        except Exception as e:
+            print(f"  ✗ {name}: not available ({e})")
+            continue
+
+        try:
+            started = time.perf_counter()
+            for array in processed:
+                backend.image_to_string(array)
+            result = _report(f"ocr.{name}", pages, time.perf_counter() - started)
+        except Exception as e:
+            print(f"  ✗ {name}: failed ({e})")
+            continue
+        finally:
+            backend.close()
+        result['startup_seconds'] = round(startup, 3)
+        results.append(result)
+
+    return results
+
+def bench_chapter_rendering(pages: int, tokens: int) -> List[Dict[str, Any]]:
+    """Time interlinear HTML and whole chapter documents on pages with many words"""
+    converter = _benchmark_converter()
+    texts = [dense_text(page_num, tokens) for page_num in range(pages)]
+
+    print(f"Chapter rendering ({pages} pages, {tokens} words per page)")
+    results = []
+    for name, render in (
+        ('create_interlinear_html', converter.create_interlinear_html),
+        ('render_chapter_html', lambda text: converter.render_chapter_html(1, text)),
+    ):
+        started = time.perf_counter()
+        for text in texts:
+            render(text)
+        seconds = time.perf_counter() - started
+        result = _report(name, pages, seconds)
+        result['tokens_per_second'] = round(pages * tokens / seconds) if seconds > 0 else 0
+        print(f"  {'':<32} {result['tokens_per_second']:>12} words/s")
+        results.append(result)
+    return results
+
+# Libraries only a conversion needs; importing the app must not load them
+HEAVY_MODULES = ['numpy', 'cv2', 'PIL.Image', 'pdf2image', 'pytesseract', 'tesserocr',
+                 'ebooklib', 'bs4', 'arabic_reshaper', 'bidi']
+
+IMPORT_PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+except ImportError:
+    peak = None
+print(json.dumps({{'seconds': seconds, 'peak_rss_mb': peak,
+                  'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def import_probe(module: str) -> Dict[str, Any]:
+    """Import a module in a fresh interpreter: seconds, peak RSS and heavy libraries it loaded"""
+    code = IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def import_breakdown(module: str, top: int = 8) -> List[Tuple[str, float]]:
+    """Slowest direct imports of a module according to python -X importtime, in seconds"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stderr
+    direct = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line.split('|')
+        # "  name" is imported by the module itself, deeper indentation by its imports
+        if name.startswith('   ') and not name.startswith('    '):
+            direct.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(direct, key=lambda item: -item[1])[:top]
+
+def bench_imports(modules: List[str], runs: int, budget_ms: float) -> List[Dict[str, Any]]:
+    """Cold import time of each module (median of fresh interpreters) against a budget"""
+    print(f"Import time ({runs} runs, budget {budget_ms:.0f} ms)")
+    results = []
+    for module in modules:
+        probes = [import_probe(module) for _ in range(runs)]
+        seconds = statistics.median(probe['seconds'] for probe in probes)
+        heavy = probes[0]['heavy']
+        result = {
+            'name': f"import.{module}",
+            'seconds': round(seconds, 3),
+            'peak_rss_mb': probes[0]['peak_rss_mb'],
+            'heavy_modules': heavy,
+            'within_budget': seconds * 1000 <= budget_ms and not heavy,
+        }
+        mark = '✓' if result['within_budget'] else '✗'
+        print(f"  {mark} {module:<30} {seconds * 1000:8.1f} ms  {result['peak_rss_mb'] or 0:8.1f} MB peak RSS")
+        if heavy:
+            print(f"    loads {', '.join(heavy)} at import")
+        if not result['within_budget']:
+            for name, cumulative in import_breakdown(module):
+                print(f"    {name:<30} {cumulative * 1000:8.1f} ms")
+        results.append(result)
+    return results
+
+def _benchmark_converter(**kwargs):
+    """Converter without OCR cache and checkpoints, so every run does the full work"""
+    from main import PDFToEpubConverter
+    kwargs.setdefault('workers', 1)
+    return PDFToEpubConverter(ocr_cache_dir='', work_dir='', **kwargs)
+
+def time_preprocess_image(pages: int) -> float:
+    converter = _benchmark_converter()
+    images = synthetic_pages(pages)
+    started = time.perf_counter()
+    for image in images:
+        converter.preprocess_image(image)
+    return time.perf_counter() - started
+
+class MissingDependency(Exception):
+    """An optional tool a benchmark needs (Tesseract, Poppler) is not installed"""
+
+def _require_ocr_engine(converter) -> None:
+    """extract_text_from_image and create_epub_book swallow OCR errors, so check the engine first"""
+    import numpy as np
+    try:
+        converter.ocr_backend.image_to_string(np.full((64, 64), 255, dtype=np.uint8))
+    except (ImportError, OSError) as e:
+        # pytesseract raises TesseractNotFoundError, an OSError, without the tesseract binary
+        raise MissingDependency(f"OCR engine ({e})") from None
+
+def _require_poppler(pdf_path: str) -> None:
+    from pdf2image import pdfinfo_from_path
+    from pdf2image.exceptions import PopplerNotInstalledError
+    try:
+        pdfinfo_from_path(pdf_path)
+    except PopplerNotInstalledError as e:
+        raise MissingDependency(f"Poppler ({e})") from None
+
+def time_extract_text_from_image(pages: int) -> float:
+    converter = _benchmark_converter()
+    _require_ocr_engine(converter)
+    images = synthetic_pages(pages)
+    started = time.perf_counter()
+    for image in images:
+        converter.extract_text_from_image(image)
+    return time.perf_counter() - started
+
+def time_create_interlinear_html(pages: int) -> float:
+    converter = _benchmark_converter()
+    texts = [synthetic_text(page_num) for page_num in range(pages)]
+    started = time.perf_counter()
+    for text in texts:
+        converter.create_interlinear_html(text)
+    return time.perf_counter() - started
+
+def time_create_epub_chapter(pages: int) -> float:
+    from page_images import encode_page_image
+    converter = _benchmark_converter()
+    image_data, _ = encode_page_image(synthetic_page(0), converter.epub_image, converter.dpi)
+    texts = [synthetic_text(page_num) for page_num in range(pages)]
+    started = time.perf_counter()
+    for page_num, text in enumerate(texts, 1):
+        converter.create_epub_chapter(page_num, text, image_data)
+    return time.perf_counter() - started
+
+def time_create_epub_book(pages: int) -> float:
+    converter = _benchmark_converter(start_page=1, end_page=pages)
+    _require_ocr_engine(converter)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = synthetic_pdf(os.path.join(tmp_dir, 'synthetic.pdf'), pages)
+        _require_poppler(pdf_path)
+        started = time.perf_counter()
+        if not converter.create_epub_book(pdf_path, os.path.join(tmp_dir, 'synthetic.epub')):
+            raise RuntimeError('create_epub_book failed')
+        return time.perf_counter() - started
+
+# Hot paths of the converter, from the single steps to the whole book
+SUITE: Dict[str, Callable[[int], float]] = {
+    'preprocess_image': time_preprocess_image,
+    'extract_text_from_image': time_extract_text_from_image,
+    'create_interlinear_html': time_create_interlinear_html,
+    'create_epub_chapter': time_create_epub_chapter,
+    'create_epub_book': time_create_epub_book,
+}
+
+def _run_case(name: str, pages: int) -> Dict[str, Any]:
+    try:
+        seconds = SUITE[name](pages)
+    except (ImportError, MissingDependency) as e:
+        # Reported as a result: the exception class would not unpickle under the script's __main__
+        return {'name': name, 'pages': pages, 'missing': str(e)}
+    except Exception as e:
+        # Not every library exception can be pickled back to the parent process
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    result = _report(name, pages, seconds)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def run_case(name: str, pages: int) -> Dict[str, Any]:
+    """Run one benchmark in a fresh process, so its peak RSS is its own"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_case, name, pages).result()
+
+def run_suite(page_counts: List[int], names: Optional[List[str]] = None) -> Dict[str, Any]:
+    print(f"Benchmark suite (page counts: {', '.join(map(str, page_counts))})")
+    results, skipped, failed = [], [], []
+    for name in names or list(SUITE):
+        for pages in page_counts:
+            try:
+                result = run_case(name, pages)
+            except Exception as e:
+                print(f"  ✗ {name} ({pages} pages): failed ({e})")
+                failed.append({'name': name, 'pages': pages, 'error': str(e)})
+                continue
+            if 'missing' in result:
+                print(f"  - {name} ({pages} pages): skipped, missing {result['missing']}")
+                skipped.append({'name': name, 'pages': pages, 'error': result['missing']})
+            else:
+                results.append(result)
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+        'skipped': skipped,
+        'failed': failed,
+    }
+
+def find_regressions(run: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Compare a run against a baseline, a slowdown or memory growth beyond threshold is a regression
+
+    A case that failed is a regression, and so is a baseline case that was skipped in this run.
+    """
+    previous = {(r['name'], r['pages']): r for r in baseline.get('results', [])}
+    regressions = []
+    for case in run.get('failed', []):
+        regressions.append(f"{case['name']} ({case['pages']} pages): failed ({case['error']})")
+    for case in run.get('skipped', []):
+        if (case['name'], case['pages']) in previous:
+            regressions.append(f"{case['name']} ({case['pages']} pages): skipped, "
+                               f"missing {case['error']}, but measured in the baseline")
+    for result in run['results']:
+        base = previous.get((result['name'], result['pages']))
+        if base is None:
+            continue
+        label = f"{result['name']} ({result['pages']} pages)"
+        if result['pages_per_second'] < base['pages_per_second'] * (1 - threshold):
+            regressions.append(f"{label}: {result['pages_per_second']} pages/s, "
+                               f"baseline {base['pages_per_second']} pages/s")
+        if result.get('peak_rss_mb') and base.get('peak_rss_mb') and \
+                result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + threshold):
+            regressions.append(f"{label}: peak RSS {result['peak_rss_mb']} MB, "
+                               f"baseline {base['peak_rss_mb']} MB")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ocr_parser = subparsers.add_parser('ocr', help='compare pages/sec of the OCR backends')
+    ocr_parser.add_argument('--pages', type=int, default=5)
+    ocr_parser.add_argument('--backend', action='append', choices=['tesserocr', 'pytesseract'],
+                            help='backend to run (repeatable, default: both)')
+
+    chapter_parser = subparsers.add_parser('chapters', help='time chapter rendering on dense pages')
+    chapter_parser.add_argument('--pages', type=int, default=20)
+    chapter_parser.add_argument('--tokens', type=int, default=5000, help='words per page')
+
+    imports_parser = subparsers.add_parser('imports', help='check cold import time against a budget')
+    imports_parser.add_argument('--module', action='append',
+                                help='module to import (repeatable, default: main and batch_convert)')
+    imports_parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per module')
+    imports_parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('PDF_IMPORT_BUDGET_MS', '300')),
+                                help='allowed median import time (PDF_IMPORT_BUDGET_MS)')
+
+    suite_parser = subparsers.add_parser('suite', help='time the converter hot paths and check for regressions')
+    suite_parser.add_argument('--pages', type=int, nargs='+', default=[1, 5, 10],
+                              help='page counts to run every benchmark with')
+    suite_parser.add_argument('--only', action='append', choices=list(SUITE),
+                              help='benchmark to run (repeatable, default: all)')
+    suite_parser.add_argument('--output', default='benchmark_results.json',
+                              help='where to write the results')
+    suite_parser.add_argument('--baseline', default='benchmark_baseline.json',
+                              help='results to compare against, if the file exists')
+    suite_parser.add_argument('--threshold', type=float, default=0.25,
+                              help='allowed slowdown / memory growth relative to the baseline')
+    suite_parser.add_argument('--save-baseline', action='store_true',
+                              help='store this run as the new baseline')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'ocr':
+        results = bench_ocr_backends(args.pages, args.backend)
+        return 0 if results else 1
+
+    if args.command == 'chapters':
+        bench_chapter_rendering(args.pages, args.tokens)
+        return 0
+
+    if args.command == 'imports':
+        results = bench_imports(args.module or ['main', 'batch_convert'], args.runs, args.budget_ms)
+        return 0 if all(result['within_budget'] for result in results) else 1
+
+    if args.command == 'suite':
+        run = run_suite(args.pages, args.only)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"Results written to {args.output}")
+
+        if args.save_baseline:
+            if run['failed']:
+                print(f"✗ Baseline not saved, {len(run['failed'])} benchmarks failed")
+                return 1
+            with open(args.baseline, 'w', encoding='utf-8') as f:
+                json.dump(run, f, indent=2)
+            print(f"✓ Baseline saved to {args.baseline}")
+            return 0
+
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+            return 1 if run['failed'] else 0
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(run, baseline, args.threshold)
+        for regression in regressions:
+            print(f"  ✗ Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"✓ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        return 0
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Chapter XHTML rendering
+Patterns are compiled and the chapter template is split into its parts once at import;
+every page is then rendered with a single join, linear in the number of words
+"""
+
+import re
+import html
+from typing import Callable, Dict, List, Optional
+
+# Whitespace-separated tokens of the OCR text
+WORD_PATTERN = re.compile(r'\S+')
+# Everything outside the Arabic blocks (incl. presentation forms), stripped for data-word
+NON_ARABIC_PATTERN = re.compile(r'[^\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]')
+
+NO_TEXT_HTML = "<p>Kein Text erkannt</p>"
+
+class ChapterTemplate:
+    """Template with {field} placeholders, split into literal chunks once and rendered with a join"""
+
+    FIELD_PATTERN = re.compile(r'\{(\w+)\}')
+
+    def __init__(self, source: str):
+        parts = self.FIELD_PATTERN.split(source)
+        self.literals: List[str] = parts[0::2]
+        self.fields: List[str] = parts[1::2]
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return ''.join(parts)
+
+CHAPTER_TEMPLATE = ChapterTemplate("""<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" lang="ar" xml:lang="ar">
+<head>
+    <title>{title}</title>
+    <link rel="stylesheet" type="text/css" href="styles.css"/>
+    <meta charset="utf-8"/>
+    <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+</head>
+<body>
+    <div class="chapter">
+        <h2 class="chapter-title">{title}</h2>
+
+        <div class="page-container">
+            <div class="image-container">
+                <img src="{image_src}" alt="{title}" class="page-image"/>
+            </div>
+
+            <div class="text-container">
+                <!-- Original Arabic text (hidden, used for audio) -->
+                <div class="arabic-text" dir="rtl" style="display: none;">
+                    {arabic_text}
+                </div>
+
+                <!-- Interlinear text container -->
+                <div class="interlinear-container">
+                    <div class="interlinear-toggle">
+                        <span>Deutsche Übersetzung:</span>
+                        <div class="toggle-switch active" onclick="toggleInterlinear()"></div>
+                        <span>An</span>
+                    </div>
+
+                    <div class="interlinear-text-container">
+{interlinear}
+                    </div>
+                </div>
+
+                <div class="interaction-controls">
+                    <button class="btn btn-audio" onclick="playAudio()">🔊 Audio abspielen</button>
+                    <button class="btn btn-translate" onclick="toggleInterlinear()">🔄 Interlinear umschalten</button>
+                    <button class="btn btn-tashkeel" onclick="toggleTashkeel()">📝 Tashkeel umschalten</button>
+                    <button class="btn btn-vocab" onclick="addToFlashcards()">📚 Ausgewählte Wörter hinzufügen</button>
+                </div>
+            </div>
+        </div>
+    </div>
+
+    <script type="text/javascript" src="script.js"></script>
+</body>
+</html>
+""")
+
+def render_interlinear(text_content: str, translate: Optional[Callable[[str], Optional[str]]] = None) -> str:
+    """HTML for interlinear word-by-word display, one block per word
+    
+    translate, if given, maps a word to its German translation (or None), which
+    is filled into the translation span instead of the placeholder.
+    """
+    if not text_content.strip():
+        return NO_TEXT_HTML
+
+    parts = []
+    append = parts.append
+    for index, match in enumerate(WORD_PATTERN.finditer(text_content)):
+        word = match.group()
+        # Clean word (remove punctuation for processing)
+        clean_word = NON_ARABIC_PATTERN.sub('', word)
+        if clean_word:
+            translation = translate(clean_word) if translate is not None else None
+            translation = html.escape(translation) if translation else '...'
+            append(f'<div class="interlinear-word clickable-word" data-word="{clean_word}" data-index="{index}">'
+                   f'<span class="arabic-word">{html.escape(word)}</span>'
+                   f'<span class="german-translation">{translation}</span></div>')
+        else:
+            # Punctuation or non-Arabic characters
+            append(f'<div class="interlinear-word"><span class="arabic-word">{html.escape(word)}</span>'
+                   f'<span class="german-translation"></span></div>')
+
+    # Keep whitespace between the words, they are inline blocks
+    return '\n'.join(parts)
+
+def render_chapter(page_num: int, text_content: str, image_src: str,
+                   translate: Optional[Callable[[str], Optional[str]]] = None) -> str:
+    """XHTML document of a chapter with interlinear text and page image"""
+    return CHAPTER_TEMPLATE.render({
+        'title': f"Seite {page_num}",
+        'image_src': html.escape(image_src),
+        'arabic_text': html.escape(text_content).replace('\n', '<br/>'),
+        'interlinear': render_interlinear(text_content, translate),
+    })
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Per-page checkpoints of a conversion
+Finished pages (text plus encoded image) are kept in a work directory keyed by the
+PDF content and the settings, so reruns and larger page ranges only process new pages;
+directories unused for the retention period or beyond the size cap are removed unless a
+running conversion holds them
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import time
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORK_DIR = 'work'
+DEFAULT_RETENTION_HOURS = 24
+DEFAULT_MAX_MB = 2048
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+class CheckpointStore:
+    """Page results of one PDF + settings combination
+
+    A page counts as done once its JSON file exists; the image is written first,
+    so a crash can never leave a JSON file pointing at a missing image.
+    """
+
+    def __init__(self, root: str, pdf_path: str, settings: Dict[str, Any], pdf_hash: Optional[str] = None):
+        # Callers that already know the content hash (the web service names uploads by it) pass it in
+        pdf_hash = pdf_hash or file_sha256(pdf_path)
+        settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+        self.directory = Path(root) / f"{pdf_hash[:16]}-{settings_hash[:12]}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Mark as recently used, pruning goes by the directory's mtime
+        os.utime(self.directory)
+        # Held until release(): prune() skips directories with a marker of a live process
+        self._marker = self.directory / f".in_use.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        self._marker.touch()
+
+    @classmethod
+    def from_env(cls, pdf_path: str, settings: Dict[str, Any], root: Optional[str] = None,
+                 pdf_hash: Optional[str] = None) -> Optional['CheckpointStore']:
+        """Store under PDF_WORK_DIR (default: work), None if checkpointing is disabled
+
+        Old checkpoints are pruned first: older than PDF_WORK_RETENTION_HOURS (default 24)
+        and, least recently used first, beyond PDF_WORK_MAX_MB (default 2048) in total.
+        """
+        if root is None:
+            root = os.environ.get('PDF_WORK_DIR', DEFAULT_WORK_DIR)
+        if not root:
+            return None
+        store = cls(root, pdf_path, settings, pdf_hash)
+        prune(root,
+              float(os.environ.get('PDF_WORK_RETENTION_HOURS', str(DEFAULT_RETENTION_HOURS))) * 3600,
+              int(os.environ.get('PDF_WORK_MAX_MB', str(DEFAULT_MAX_MB))) * 1024 * 1024)
+        return store
+
+    def release(self) -> None:
+        """Let prune() remove the directory again once the conversion is over"""
+        try:
+            self._marker.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _meta_path(self, page_num: int) -> Path:
+        return self.directory / f"page_{page_num:04d}.json"
+
+    def done_pages(self) -> Set[int]:
+        pages = set()
+        for path in self.directory.glob('page_*.json'):
+            try:
+                pages.add(int(path.stem.split('_')[1]))
+            except (IndexError, ValueError):
+                continue
+        return pages
+
+    def save(self, page_num: int, text_content: str, image_data: bytes,
+             image_extension: str, page_info: Dict[str, Any]) -> None:
+        image_name = f"page_{page_num:04d}.{image_extension}"
+        # Another process may have pruned the directory just before this conversion claimed it
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.directory / image_name, image_data)
+
+        meta = {
+            'page_num': page_num,
+            'text': text_content,
+            'image': image_name,
+            'image_bytes': page_info.get('image_bytes', {}),
+        }
+        _write_atomic(self._meta_path(page_num), json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    def load(self, page_num: int) -> Tuple[str, bytes, Dict[str, Any]]:
+        """Return (text, image_bytes, page_info) of a finished page"""
+        meta = json.loads(self._meta_path(page_num).read_text(encoding='utf-8'))
+        image_data = (self.directory / meta['image']).read_bytes()
+        page_info = {'seconds': 0.0, 'checkpoint': True, 'image_bytes': meta.get('image_bytes', {})}
+        return meta['text'], image_data, page_info
+
+def _in_use(directory: Path) -> bool:
+    """Whether a conversion of a live process holds the directory"""
+    for marker in directory.glob('.in_use.*'):
+        try:
+            os.kill(int(marker.name.split('.')[2]), 0)
+        except (IndexError, ValueError, ProcessLookupError):
+            continue  # left behind by a process that died
+        except PermissionError:
+            pass
+        return True
+    return False
+
+def prune(root: str, retention_seconds: float, max_bytes: int) -> None:
+    """Remove checkpoint directories unused for retention_seconds, then the least recently
+    used ones until the rest fits in max_bytes; directories in use are kept and still count"""
+    try:
+        directories = [path for path in Path(root).iterdir() if path.is_dir()]
+    except FileNotFoundError:
+        return
+    entries = []
+    for directory in directories:
+        try:
+            size = sum(path.stat().st_size for path in directory.iterdir())
+            entries.append((directory.stat().st_mtime, size, directory))
+        except FileNotFoundError:
+            continue  # removed by another process meanwhile
+
+    cutoff = time.time() - retention_seconds
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, directory in sorted(entries):
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        if _in_use(directory):
+            continue
+        logger.info(f"Removing checkpoints {directory.name} ({size // 1024} KB)")
+        shutil.rmtree(directory, ignore_errors=True)
+        total -= size
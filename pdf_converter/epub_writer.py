@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Streaming EPUB writer
+Writes every chapter and image into the output zip as soon as it is produced and
+only the package document, NCX and nav at the end, so memory does not grow with the book
+"""
+
+import os
+import zipfile
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from html import escape as _escape
+
+CONTAINER_XML = """<?xml version='1.0' encoding='utf-8'?>
+<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0">
+  <rootfiles>
+    <rootfile media-type="application/oebps-package+xml" full-path="EPUB/content.opf"/>
+  </rootfiles>
+</container>
+"""
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+# html.escape instead of xml.sax.saxutils, which pulls in urllib.request at import
+def escape(text: str) -> str:
+    return _escape(text, quote=False)
+
+def quoteattr(text: str) -> str:
+    return f'"{_escape(text)}"'
+
+class StreamingEpubWriter:
+    """Incremental EPUB 3 writer (with an NCX for EPUB 2 readers)
+
+    Output goes to "<output_path>.part" and is renamed into place by close(), so a
+    failed conversion never leaves a truncated EPUB behind.
+    """
+
+    def __init__(self, output_path: str, identifier: str, title: str, language: str, author: str):
+        self.output_path = output_path
+        self.identifier = identifier
+        self.title = title
+        self.language = language
+        self.author = author
+
+        # (id, href, media type, properties) of everything written so far
+        self._manifest: List[Tuple[str, str, str, Optional[str]]] = []
+        # (id, href, title) of the chapters in reading order
+        self._chapters: List[Tuple[str, str, str]] = []
+
+        self._part_path = f"{output_path}.part"
+        self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(self._part_path, 'w', zipfile.ZIP_DEFLATED)
+        # The mimetype must be the first entry and stored uncompressed
+        self._zip.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        self._zip.writestr('META-INF/container.xml', CONTAINER_XML)
+
+    def __enter__(self) -> 'StreamingEpubWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_item(self, uid: str, file_name: str, media_type: str, content,
+                 compress: bool = True, properties: Optional[str] = None) -> None:
+        """Write a file (stylesheet, script, image, ...) into the book right away"""
+        compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self._zip.writestr(f"EPUB/{file_name}", content, compress_type=compress_type)
+        self._manifest.append((uid, file_name, media_type, properties))
+
+    def add_chapter(self, uid: str, file_name: str, title: str, xhtml: str, scripted: bool = True) -> None:
+        """Write a chapter document and append it to the spine and table of contents"""
+        if not xhtml.lstrip().startswith('<?xml'):
+            xhtml = XML_DECLARATION + xhtml.lstrip()
+        self.add_item(uid, file_name, 'application/xhtml+xml', xhtml.encode('utf-8'),
+                      properties='scripted' if scripted else None)
+        self._chapters.append((uid, file_name, title))
+
+    @property
+    def chapter_count(self) -> int:
+        return len(self._chapters)
+
+    def close(self, output_path: Optional[str] = None) -> None:
+        """Write nav, NCX and package document, then move the EPUB to output_path (default: the constructor's)"""
+        if self._zip is None:
+            return
+        self._zip.writestr('EPUB/nav.xhtml', self._nav_xhtml())
+        self._zip.writestr('EPUB/toc.ncx', self._toc_ncx())
+        self._zip.writestr('EPUB/content.opf', self._content_opf())
+        self._zip.close()
+        self._zip = None
+        os.replace(self._part_path, output_path or self.output_path)
+
+    def abort(self) -> None:
+        """Discard the partial output"""
+        if self._zip is None:
+            return
+        self._zip.close()
+        self._zip = None
+        if os.path.exists(self._part_path):
+            os.unlink(self._part_path)
+
+    def _nav_xhtml(self) -> str:
+        items = '\n'.join(
+            f'        <li><a href={quoteattr(href)}>{escape(title)}</a></li>'
+            for _, href, title in self._chapters
+        )
+        return f"""{XML_DECLARATION}<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang={quoteattr(self.language)} xml:lang={quoteattr(self.language)}>
+  <head>
+    <title>{escape(self.title)}</title>
+  </head>
+  <body>
+    <nav epub:type="toc" id="id" role="doc-toc">
+      <h2>{escape(self.title)}</h2>
+      <ol>
+{items}
+      </ol>
+    </nav>
+  </body>
+</html>
+"""
+
+    def _toc_ncx(self) -> str:
+        points = '\n'.join(
+            f"""    <navPoint id={quoteattr(uid)}>
+      <navLabel>
+        <text>{escape(title)}</text>
+      </navLabel>
+      <content src={quoteattr(href)}/>
+    </navPoint>"""
+            for uid, href, title in self._chapters
+        )
+        return f"""{XML_DECLARATION}<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+  <head>
+    <meta content={quoteattr(self.identifier)} name="dtb:uid"/>
+    <meta content="0" name="dtb:depth"/>
+    <meta content="0" name="dtb:totalPageCount"/>
+    <meta content="0" name="dtb:maxPageNumber"/>
+  </head>
+  <docTitle>
+    <text>{escape(self.title)}</text>
+  </docTitle>
+  <navMap>
+{points}
+  </navMap>
+</ncx>
+"""
+
+    def _content_opf(self) -> str:
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        items = [
+            '    <item href="nav.xhtml" id="nav" media-type="application/xhtml+xml" properties="nav"/>',
+            '    <item href="toc.ncx" id="ncx" media-type="application/x-dtbncx+xml"/>',
+        ]
+        for uid, href, media_type, properties in self._manifest:
+            extra = f' properties={quoteattr(properties)}' if properties else ''
+            items.append(f'    <item href={quoteattr(href)} id={quoteattr(uid)} media-type={quoteattr(media_type)}{extra}/>')
+        itemrefs = ['    <itemref idref="nav"/>'] + [
+            f'    <itemref idref={quoteattr(uid)}/>' for uid, _, _ in self._chapters
+        ]
+        manifest = '\n'.join(items)
+        spine = '\n'.join(itemrefs)
+
+        return f"""{XML_DECLARATION}<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="id" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
+    <meta property="dcterms:modified">{modified}</meta>
+    <dc:identifier id="id">{escape(self.identifier)}</dc:identifier>
+    <dc:title>{escape(self.title)}</dc:title>
+    <dc:language>{escape(self.language)}</dc:language>
+    <dc:creator id="creator">{escape(self.author)}</dc:creator>
+  </metadata>
+  <manifest>
+{manifest}
+  </manifest>
+  <spine toc="ncx">
+{spine}
+  </spine>
+</package>
+"""
@@ -0,0 +1,24 @@
+"""
+gunicorn settings for the converter
+Several worker processes with threads, so /healthz, /readyz and /jobs answer while a conversion runs
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+
+# Each worker process runs its own job threads; job state is shared through PDF_JOB_STATE_DIR
+workers = int(os.environ.get('PDF_WEB_WORKERS', '2'))
+# Request threads per worker: long uploads and polling do not block health checks
+worker_class = 'gthread'
+threads = int(os.environ.get('PDF_WEB_THREADS', '4'))
+
+# Uploads of large PDFs can take a while; conversions run in the background and are not bound by this
+timeout = int(os.environ.get('PDF_WEB_TIMEOUT', '120'))
+graceful_timeout = 60
+keepalive = 5
+
+# No preload: job threads and OCR engines are created per worker after the fork.
+# No max_requests: recycling a worker would abort the conversions it is running.
+accesslog = '-'
+errorlog = '-'
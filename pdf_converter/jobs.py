@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Background conversion jobs
+A bounded in-process queue with worker threads, so /convert can return immediately;
+job state is mirrored to disk so every server process can answer for every job
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+class Job:
+    """State and progress of a single PDF to EPUB conversion"""
+
+    def __init__(self, pdf_path: str, epub_path: str, start_page: int, end_page: int,
+                 options: Optional[Dict[str, Any]] = None, key: Optional[str] = None,
+                 cost: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        # Identical requests (same PDF content, range and settings) share a key
+        self.key = key
+        self.pdf_path = pdf_path
+        self.epub_path = epub_path
+        self.start_page = start_page
+        self.end_page = end_page
+        self.options = options or {}
+        # Estimated pages and memory, for admission control (see admission.estimate_cost)
+        self.cost = cost
+
+        self.state = QUEUED
+        self.pages_done = 0
+        # The cost counts the pages the PDF has, the requested range may run past its end
+        self.pages_total = (cost or {}).get('pages', end_page - start_page + 1)
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.download_url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.result: Dict[str, Any] = {}
+        # Called after every progress update (the manager persists the state)
+        self.on_progress: Optional[Callable[['Job'], None]] = None
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'Job':
+        """Job as saved by JobStore, e.g. one run by another server process"""
+        job = cls('', '', state['start_page'], state['end_page'], key=state.get('key'), cost=state.get('cost'))
+        for name in ('state', 'pages_done', 'pages_total', 'created_at', 'started_at', 'finished_at',
+                     'download_url', 'error', 'result'):
+            setattr(job, name, state.get(name))
+        job.id = state['job_id']
+        return job
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Everything from_state needs, on top of the API representation"""
+        return {
+            **self.to_dict(),
+            'key': self.key,
+            'cost': self.cost,
+            'start_page': self.start_page,
+            'end_page': self.end_page,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    def update_progress(self, pages_done: int, pages_total: int) -> None:
+        """Progress callback for the converter"""
+        self.pages_done = pages_done
+        self.pages_total = pages_total
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimate the remaining time from the average time per finished page"""
+        if self.state != RUNNING or not self.started_at or not self.pages_done:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = max(self.pages_total - self.pages_done, 0)
+        return round(elapsed / self.pages_done * remaining, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'eta_seconds': self.eta_seconds(),
+            'download_url': self.download_url,
+            'error': self.error,
+            'result': self.result,
+        }
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot take another job"""
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobStore:
+    """Job state as JSON files in a directory shared by all server processes on a host
+
+    Any process can report on a job, and a request identical to a conversion running
+    in another process joins it through a per-key claim file. Jobs whose owning process
+    has died are reported as failed.
+    """
+
+    def __init__(self, directory: str, retention_seconds: float = 24 * 3600):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.retention_seconds = retention_seconds
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def _key_path(self, key: str) -> Path:
+        return self.directory / f"key-{key}"
+
+    def save(self, job: Job) -> None:
+        state = {**job.state_dict(), 'pid': os.getpid(), 'updated_at': time.time()}
+        path = self._path(job.id)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._path(job_id), encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state['state'] in (QUEUED, RUNNING) and not _process_alive(state['pid']):
+            state['state'] = FAILED
+            state['error'] = 'Serverprozess wurde beendet'
+            state['eta_seconds'] = None
+        return state
+
+    def discard(self, job_id: str) -> None:
+        try:
+            self._path(job_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def claim(self, job: Job) -> Optional[Dict[str, Any]]:
+        """Make job the active conversion for its key
+        
+        Returns the state of the queued or running job that already holds the key, None if
+        job got it. The job must be saved first so other processes can look it up.
+        """
+        path = self._key_path(job.key)
+        # The claim is written to a temporary file and linked into place, so other
+        # processes never see a claim file without the holder's id
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(job.id)
+        try:
+            for _ in range(3):
+                try:
+                    os.link(tmp_path, path)
+                    return None
+                except FileExistsError:
+                    pass
+                try:
+                    holder = path.read_text().strip()
+                except FileNotFoundError:
+                    continue
+                state = self.load(holder)
+                if state is not None and state['state'] in (QUEUED, RUNNING):
+                    return state
+                # Left behind by a finished job or a dead process
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            return None
+        finally:
+            tmp_path.unlink()
+
+    def release(self, job: Job) -> None:
+        path = self._key_path(job.key)
+        try:
+            if path.read_text().strip() == job.id:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def active(self) -> List[Dict[str, Any]]:
+        """States of the queued and running jobs of all other live processes"""
+        states = []
+        for path in self.directory.glob('*.json'):
+            state = self.load(path.stem)
+            if state is not None and state['state'] in (QUEUED, RUNNING) and state['pid'] != os.getpid():
+                states.append(state)
+        return states
+
+    def prune(self) -> None:
+        """Remove the state of jobs that finished longer ago than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        for path in self.directory.glob('*.json'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+class JobManager:
+    """Runs conversion jobs on a fixed number of background threads"""
+
+    def __init__(self, run_job: Callable[[Job], None], max_queue: int = 16,
+                 concurrency: int = 1, max_finished: int = 200, store: Optional[JobStore] = None,
+                 progress_interval: float = 1.0, admission=None):
+        self.run_job = run_job
+        self.concurrency = max(1, concurrency)
+        self.max_finished = max_finished
+        # Shared state for multi-process servers; progress is written at most every progress_interval seconds
+        self.store = store
+        self.progress_interval = progress_interval
+        # Optional AdmissionController: rejects jobs over the page budget, holds them for memory
+        self.admission = admission
+        self._saved_at: Dict[str, float] = {}
+
+        self._queue: 'queue.Queue[Job]' = queue.Queue(maxsize=max(1, max_queue))
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._active_by_key: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, job: Job) -> Job:
+        """Enqueue a job, raising QueueFullError when the queue is at capacity
+        
+        If a queued or running job has the same key, that job is returned instead,
+        so concurrent identical requests are coalesced onto a single conversion
+        (across server processes when a store is configured). With admission control,
+        a new job over the page budget raises AdmissionError.
+        """
+        self._start_workers()
+        with self._lock:
+            active = self._active_by_key.get(job.key) if job.key else None
+            if active is not None:
+                logger.info(f"Joining running job {active.id} for identical request")
+                return active
+            if self.store is not None:
+                self.store.save(job)
+                other = self.store.claim(job) if job.key else None
+                if other is not None:
+                    self.store.discard(job.id)
+                    logger.info(f"Joining job {other['job_id']} of process {other['pid']} for identical request")
+                    return Job.from_state(other)
+            try:
+                if self.admission is not None:
+                    self.admission.admit(job, self._active_jobs())
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._forget(job)
+                raise QueueFullError('Job queue is full')
+            except Exception:
+                self._forget(job)
+                raise
+            job.on_progress = self._progress
+            self._jobs[job.id] = job
+            if job.key:
+                self._active_by_key[job.key] = job
+            self._prune()
+        logger.info(f"Queued job {job.id} (pages {job.start_page}-{job.end_page})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job of this process, or from the store if another process runs it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            state = self.store.load(job_id)
+            if state is not None:
+                job = Job.from_state(state)
+        return job
+
+    def active_jobs(self) -> List[Job]:
+        """Queued and running jobs of this process and, with a store, of all others"""
+        with self._lock:
+            return self._active_jobs()
+
+    def _active_jobs(self) -> List[Job]:
+        jobs = [job for job in self._jobs.values() if job.state in (QUEUED, RUNNING)]
+        return jobs + self._other_jobs()
+
+    def _other_jobs(self, state: Optional[str] = None) -> List[Job]:
+        if self.store is None:
+            return []
+        return [Job.from_state(other) for other in self.store.active() if state is None or other['state'] == state]
+
+    def _forget(self, job: Job) -> None:
+        """Undo the store entries of a job that was not queued"""
+        if self.store is not None:
+            if job.key:
+                self.store.release(job)
+            self.store.discard(job.id)
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def queue_full(self) -> bool:
+        return self._queue.full()
+
+    def _save(self, job: Job) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+            self._saved_at[job.id] = time.time()
+        except OSError as e:
+            logger.warning(f"Could not save state of job {job.id}: {e}")
+
+    def _progress(self, job: Job) -> None:
+        if time.time() - self._saved_at.get(job.id, 0.0) >= self.progress_interval:
+            self._save(job)
+
+    def _start_workers(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.concurrency):
+                thread = threading.Thread(target=self._worker, name=f"conversion-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if self.admission is not None:
+                self.admission.wait_to_start(job, lambda: self._other_jobs(RUNNING))
+            job.state = RUNNING
+            job.started_at = time.time()
+            self._save(job)
+            logger.info(f"Starting job {job.id}")
+            try:
+                self.run_job(job)
+                if job.state == RUNNING:
+                    job.state = FINISHED
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.state = FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self._save(job)
+                self._saved_at.pop(job.id, None)
+                with self._lock:
+                    if job.key and self._active_by_key.get(job.key) is job:
+                        del self._active_by_key[job.key]
+                if self.store is not None and job.key:
+                    self.store.release(job)
+                if self.admission is not None:
+                    self.admission.finished(job)
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs once more than max_finished are kept"""
+        done = [job_id for job_id, job in self._jobs.items() if job.state in (FINISHED, FAILED)]
+        for job_id in done[:max(0, len(done) - self.max_finished)]:
+            del self._jobs[job_id]
+        if self.store is not None:
+            self.store.prune()
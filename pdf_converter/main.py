@@ -4,89 +4,313 @@ PDF to EPUB Converter with OCR Support
 Converts PDF pages 30-180 to an interactive EPUB book with Arabic text support
 """
 
+from __future__ import annotations
+
 import os
 import sys
+import shutil
+import json
+import hashlib
+import time
 import logging
 from pathlib import Path
 import tempfile
 import zipfile
-from typing import List, Tuple, Optional
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Tuple, Optional
 
-# PDF and Image Processing
-from pdf2image import convert_from_path
-from PIL import Image, ImageEnhance, ImageFilter
-import cv2
-import numpy as np
+# PDF rendering (pdf2image), imaging (PIL, NumPy, OpenCV via preprocessing and text_regions),
+# OCR, EPUB (ebooklib) and Arabic shaping (arabic_reshaper, bidi) are imported where a
+# conversion first needs them, so the web app, health checks and CLI tools start fast
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+    from ebooklib import epub
 
 # OCR
-import pytesseract
-
-# EPUB Creation
-from ebooklib import epub
-from bs4 import BeautifulSoup
-
-# Arabic Text Processing
-import arabic_reshaper
-from bidi.algorithm import get_display
+from ocr_backends import OCRBackend, create_backend, default_backend_name, resolve_backend_name
 
 # Web Framework
-from flask import Flask, request, jsonify, send_file
+from flask import Blueprint, Flask, Request, Response, current_app, request, jsonify, send_file
+from werkzeug.security import safe_join
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+
+# Background Jobs and Caching
+from jobs import FAILED, FINISHED, Job, JobManager, JobStore, QueueFullError
+from admission import AdmissionController, AdmissionError, estimate_cost
+from ocr_cache import LOW_CONFIDENCE, OCRCache
+from page_images import EpubImageSettings, encode_page_image
+from checkpoints import CheckpointStore, file_sha256
+from epub_writer import StreamingEpubWriter
+from chapter_html import render_chapter, render_interlinear
+from vocabulary import VocabularyIndex, load_vocabulary
+from metrics import (JOBS_REJECTED, JOBS_TOTAL, OCR_PIXELS_TOTAL, OCR_SECONDS_SAVED, PAGES_TOTAL, QUEUED_JOBS, REGISTRY,
+                     VOCABULARY_LOOKUPS, StageTimings)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stylesheet and script shipped inside every EPUB
+ASSET_DIR = Path(__file__).resolve().parent
+
+# EPUB metadata
+BOOK_IDENTIFIER = 'arabic-learning-book-001'
+BOOK_TITLE = 'Arabisches Lernbuch'
+BOOK_LANGUAGE = 'ar'
+BOOK_AUTHOR = 'ArabicAI Learning Platform'
+
+def default_worker_count() -> int:
+    """Number of OCR worker processes, taken from PDF_OCR_WORKERS (default: 1 = serial)"""
+    try:
+        workers = int(os.environ.get('PDF_OCR_WORKERS', '1'))
+    except ValueError:
+        logger.warning("Invalid PDF_OCR_WORKERS value, falling back to 1")
+        workers = 1
+    return clamp_worker_count(workers)
+
+def clamp_worker_count(workers: int) -> int:
+    """Keep a requested worker count between 1 and the number of CPUs"""
+    return max(1, min(workers, os.cpu_count() or 1))
+
 class PDFToEpubConverter:
-    def __init__(self, start_page: int = 30, end_page: int = 180):
+    def __init__(self, start_page: int = 30, end_page: int = 180, window_size: int = 4,
+                 dpi: int = 300, ocr_config: Optional[str] = None,
+                 workers: Optional[int] = None, executor: Optional[Executor] = None,
+                 ocr_cache_dir: Optional[str] = None, preprocess_stages: Optional[str] = None,
+                 ocr_backend: Optional[str] = None, epub_image: Optional[Dict[str, Any]] = None,
+                 work_dir: Optional[str] = None, epub_writer: Optional[str] = None,
+                 vocabulary: Optional[VocabularyIndex] = None, text_regions: Optional[bool] = None,
+                 adaptive_dpi: Optional[int] = None, min_confidence: Optional[float] = None):
         self.start_page = start_page
         self.end_page = end_page
         self.temp_dir = tempfile.mkdtemp()
         
+        # Rendering: pages are rendered in windows of this size so peak
+        # memory depends on the window, not on the page range
+        self.dpi = dpi
+        self.window_size = max(1, window_size)
+        
+        # Adaptive resolution (PDF_ADAPTIVE_DPI, 0 = off): pages are rendered and OCR'd at this
+        # lower dpi first and only re-rendered at dpi when Tesseract's mean word confidence
+        # is below min_confidence (PDF_ADAPTIVE_MIN_CONFIDENCE)
+        if adaptive_dpi is None:
+            adaptive_dpi = int(os.environ.get('PDF_ADAPTIVE_DPI') or 0)
+        self.adaptive_dpi = adaptive_dpi if 0 < adaptive_dpi < dpi else 0
+        if min_confidence is None:
+            min_confidence = float(os.environ.get('PDF_ADAPTIVE_MIN_CONFIDENCE', '75'))
+        self.min_confidence = min_confidence
+        
         # OCR configuration for Arabic
-        self.ocr_config = r'--oem 3 --psm 6 -l ara+eng'
+        self.ocr_config = ocr_config or r'--oem 3 --psm 6 -l ara+eng'
         
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
-        """Enhance image quality for better OCR results"""
-        # Convert to OpenCV format
-        opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # OCR engine ("auto", "tesserocr" or "pytesseract", PDF_OCR_BACKEND), created on first use
+        # and kept for the lifetime of the converter; "auto" is resolved here, so cache keys,
+        # checkpoints, pool workers and the engine all use the same backend
+        self.ocr_backend_name = resolve_backend_name(ocr_backend or default_backend_name())
+        self._ocr_backend: Optional[OCRBackend] = None
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
+        # Preprocessing stages, e.g. "blur,threshold,close" (PDF_PREPROCESS_STAGES)
+        if preprocess_stages is None:
+            preprocess_stages = os.environ.get('PDF_PREPROCESS_STAGES')
+        from preprocessing import PreprocessPipeline
+        self.preprocessor = PreprocessPipeline.from_stage_list(preprocess_stages)
         
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        # Layout pre-pass on the preprocessed page (PDF_TEXT_REGIONS): blank pages skip
+        # OCR and only the text blocks are sent to the engine
+        from text_regions import TextRegionDetector
+        self.text_regions = TextRegionDetector.from_env(text_regions)
         
-        # Apply adaptive threshold
-        thresh = cv2.adaptiveThreshold(
-            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
+        # Page images embedded in the EPUB, independent of the OCR resolution
+        # (PDF_EPUB_IMAGE_FORMAT/_DPI/_WIDTH/_QUALITY); encoded on a helper thread
+        self.epub_image = EpubImageSettings(**epub_image) if epub_image else EpubImageSettings.from_env()
+        self._image_encoder: Optional[ThreadPoolExecutor] = None
+        
+        # Persistent OCR cache (PDF_OCR_CACHE_DIR, empty string disables it)
+        self.ocr_cache = OCRCache.from_env(ocr_cache_dir)
         
-        # Morphological operations to clean up
-        kernel = np.ones((2, 2), np.uint8)
-        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        # Per-page checkpoints (PDF_WORK_DIR, empty string disables them); reruns of
+        # the same PDF and settings only process pages that are not done yet
+        self.work_dir = work_dir
         
-        # Convert back to PIL Image
-        return Image.fromarray(cleaned)
+        # EPUB writer: "streaming" writes every page into the zip as soon as it is done,
+        # "ebooklib" builds the whole book in memory first (PDF_EPUB_WRITER)
+        self.epub_writer = epub_writer or os.environ.get('PDF_EPUB_WRITER', 'streaming')
+        if self.epub_writer not in ('streaming', 'ebooklib'):
+            raise ValueError(f"Unknown EPUB writer: {self.epub_writer}")
+        
+        # German translations prefilled into the interlinear text (PDF_VOCAB_PATH),
+        # the shared per-process index is loaded on first use
+        self._vocabulary = vocabulary
+        self._vocabulary_loaded = vocabulary is not None
+        # Lookups of this conversion; the index itself is shared and keeps no counters
+        self.vocabulary_stats = {'lookups': 0, 'hits': 0}
+        
+        # Worker pool: with more than one worker (or a shared executor) pages are
+        # rendered and OCR'd in separate processes and reassembled in page order
+        self.workers = clamp_worker_count(workers) if workers else default_worker_count()
+        self.executor = executor
+        
+        # Throughput report of the last conversion
+        self.stats: Dict[str, Any] = {}
+        # Seconds per stage (render, preprocess, ocr, reshape, encode, epub_write, ...)
+        self.timings = StageTimings()
+        
+    def page_settings(self) -> Dict[str, Any]:
+        """Constructor arguments a pool worker needs to process pages like this converter"""
+        return {
+            'dpi': self.dpi,
+            'ocr_config': self.ocr_config,
+            'ocr_cache_dir': str(self.ocr_cache.directory) if self.ocr_cache else '',
+            'preprocess_stages': ','.join(self.preprocessor.stages),
+            'text_regions': self.text_regions.enabled,
+            'adaptive_dpi': self.adaptive_dpi,
+            'min_confidence': self.min_confidence,
+            'ocr_backend': self.ocr_backend_name,
+            'epub_image': self.epub_image.as_dict(),
+        }
     
-    def extract_text_from_image(self, image: Image.Image) -> str:
-        """Extract text from image using Tesseract OCR"""
-        try:
+    @property
+    def render_dpi(self) -> int:
+        """Resolution of the first render of every page"""
+        return self.adaptive_dpi or self.dpi
+    
+    @property
+    def vocabulary(self) -> Optional[VocabularyIndex]:
+        if not self._vocabulary_loaded:
+            self._vocabulary = load_vocabulary()
+            self._vocabulary_loaded = True
+        return self._vocabulary
+    
+    @property
+    def ocr_backend(self) -> OCRBackend:
+        """Long-lived OCR engine of this converter"""
+        if self._ocr_backend is None:
+            self._ocr_backend = create_backend(self.ocr_backend_name, self.ocr_config)
+            logger.info(f"Using OCR backend {self._ocr_backend.name}")
+        return self._ocr_backend
+    
+    def checkpoint_settings(self) -> Dict[str, Any]:
+        """Settings that change a page's text or image; checkpoints are only reused when they match"""
+        return {
+            'dpi': self.dpi,
+            'adaptive_dpi': [self.adaptive_dpi, self.min_confidence] if self.adaptive_dpi else None,
+            'ocr': self.ocr_settings_signature(),
+            'epub_image': self.epub_image.as_dict(),
+        }
+    
+    def result_key(self, pdf_hash: str) -> str:
+        """Key of the EPUB this converter produces for a PDF, identical requests share it"""
+        request = {
+            'pdf': pdf_hash,
+            'pages': [self.start_page, self.end_page],
+            'settings': self.checkpoint_settings(),
+            'vocabulary': self.vocabulary.signature if self.vocabulary else None,
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def ocr_settings_signature(self) -> str:
+        """Everything besides the page pixels that changes the OCR output"""
+        # tesserocr and pytesseract can differ on the same page
+        return f"{self.ocr_backend_name}|{self.ocr_config}|{self.preprocessor.signature()}|{self.text_regions.signature()}"
+    
+    def preprocess_image(self, image: Image.Image) -> np.ndarray:
+        """Enhance image quality for better OCR results
+        
+        Returns the binarised grayscale array, which lives in a buffer reused for the next page.
+        """
+        return self.preprocessor.run(image)
+    
+    def recognize_text(self, image: Image.Image, page_info: Optional[Dict[str, Any]] = None,
+                       min_confidence: Optional[float] = None) -> Optional[str]:
+        """OCR text of a page in logical order (before reshaping), served from the OCR cache when possible
+        
+        With min_confidence, returns None instead when Tesseract's mean word confidence is below
+        it; the rejection is cached too, so reruns skip this pass. Raises if the OCR engine fails;
+        extract_text_from_image is the forgiving variant for display.
+        """
+        text = None
+        cache_key = None
+        if self.ocr_cache is not None:
+            settings = self.ocr_settings_signature()
+            if min_confidence is not None:
+                settings += f"|min_confidence={min_confidence}"
+            with self.timings.time('ocr_cache'):
+                cache_key = OCRCache.key(image, settings)
+                text = self.ocr_cache.get(cache_key)
+            if page_info is not None:
+                page_info['ocr_cache'] = 'miss' if text is None else 'hit'
+            if text is not None and text.startswith(LOW_CONFIDENCE):
+                if page_info is not None:
+                    page_info['ocr_confidence'] = float(text[len(LOW_CONFIDENCE):])
+                return None
+        
+        if text is None:
             # Preprocess image
-            processed_image = self.preprocess_image(image)
+            with self.timings.time('preprocess'):
+                processed_image = self.preprocess_image(image)
+            if page_info is not None:
+                page_info['preprocess_seconds'] = dict(self.preprocessor.timings)
             
-            # Extract text
-            text = pytesseract.image_to_string(processed_image, config=self.ocr_config)
+            # Skip blank pages and crop to the text blocks
+            with self.timings.time('layout'):
+                layout = self.text_regions.detect(processed_image, self.preprocessor.grayscale)
+            if page_info is not None:
+                page_info['text_regions'] = layout.as_dict()
             
-            # Clean and reshape Arabic text
-            if text.strip():
-                # Remove extra whitespace
-                text = ' '.join(text.split())
-                
-                # Reshape Arabic text for proper display
-                reshaped_text = arabic_reshaper.reshape(text)
-                bidi_text = get_display(reshaped_text)
+            # Extract text (straight from the array, one call per region) and remove extra whitespace
+            texts = []
+            confidences = []
+            if layout.regions:
+                with self.timings.time('ocr'):
+                    for x0, y0, x1, y1 in layout.regions:
+                        region = processed_image[y0:y1, x0:x1]
+                        if min_confidence is None:
+                            texts.append(self.ocr_backend.image_to_string(region))
+                            continue
+                        region_text, confidence = self.ocr_backend.image_to_data(region)
+                        texts.append(region_text)
+                        if confidence is not None:
+                            confidences.append((confidence, len(region_text.split())))
+            text = ' '.join(' '.join(texts).split())
+            
+            if confidences:
+                # Mean over all words of the page
+                words = sum(count for _, count in confidences) or len(confidences)
+                confidence = sum(value * (count or 1) for value, count in confidences) / words
+                if page_info is not None:
+                    page_info['ocr_confidence'] = round(confidence, 1)
+                if confidence < min_confidence:
+                    if cache_key is not None:
+                        with self.timings.time('ocr_cache'):
+                            self.ocr_cache.put(cache_key, f"{LOW_CONFIDENCE}{confidence:.1f}")
+                    return None
+            
+            if cache_key is not None:
+                with self.timings.time('ocr_cache'):
+                    self.ocr_cache.put(cache_key, text)
+        return text
+    
+    def extract_text_from_image(self, image: Image.Image, page_info: Optional[Dict[str, Any]] = None,
+                                rerender: Optional[Callable[[], Image.Image]] = None) -> str:
+        """Extract text from image using Tesseract OCR, reshaped for display
+        
+        In adaptive mode, image is the low-resolution render and rerender returns the page
+        at full dpi, which is only requested when the first pass has low confidence.
+        An OCR failure yields an empty page and is recorded in page_info['error'], so the
+        page is not checkpointed and a later run tries it again.
+        """
+        try:
+            text = self.recognize_text_adaptive(image, page_info, rerender)
+            
+            # Reshape Arabic text for proper display
+            if text:
+                import arabic_reshaper
+                from bidi.algorithm import get_display
+                with self.timings.time('reshape'):
+                    reshaped_text = arabic_reshaper.reshape(text)
+                    bidi_text = get_display(reshaped_text)
                 
                 return bidi_text
             
@@ -94,241 +318,746 @@ class PDFToEpubConverter:
             
         except Exception as e:
             logger.error(f"OCR Error: {e}")
+            if page_info is not None:
+                page_info['error'] = str(e)
             return ""
     
-    def pdf_to_images(self, pdf_path: str) -> List[Image.Image]:
-        """Convert PDF pages to images"""
+    def recognize_text_adaptive(self, image: Image.Image, page_info: Optional[Dict[str, Any]] = None,
+                                rerender: Optional[Callable[[], Image.Image]] = None) -> str:
+        """recognize_text on the first render, repeated on a full-dpi render if its confidence is low"""
+        if page_info is None:
+            page_info = {}
+        if not self.adaptive_dpi or rerender is None:
+            page_info['dpi'] = self.render_dpi
+            return self.recognize_text(image, page_info)
+        
+        text = self.recognize_text(image, page_info, self.min_confidence)
+        if text is not None:
+            page_info['dpi'] = self.adaptive_dpi
+            return text
+        
+        logger.info(f"Low OCR confidence ({page_info.get('ocr_confidence')}) at {self.adaptive_dpi} dpi, "
+                    f"re-rendering at {self.dpi} dpi")
+        with self.timings.time('render_high'):
+            high_res = rerender()
+        if high_res is None:
+            return ''
         try:
-            logger.info(f"Converting PDF pages {self.start_page}-{self.end_page}")
-            
-            # Convert specified pages to images
+            page_info['dpi'] = self.dpi
+            return self.recognize_text(high_res, page_info)
+        finally:
+            high_res.close()
+    
+    def render_page(self, pdf_path: str, page_num: int, dpi: Optional[int] = None) -> Optional[Image.Image]:
+        """Render a single page, None if it is beyond the end of the document"""
+        from pdf2image import convert_from_path
+        images = convert_from_path(
+            pdf_path,
+            first_page=page_num,
+            last_page=page_num,
+            dpi=dpi or self.render_dpi,
+            fmt='PNG'
+        )
+        return images[0] if images else None
+    
+    def last_page(self, pdf_path: str) -> int:
+        """Clamp the requested end page to the number of pages in the PDF"""
+        try:
+            from pdf2image import pdfinfo_from_path
+            total_pages = int(pdfinfo_from_path(pdf_path)['Pages'])
+            return min(self.end_page, total_pages)
+        except Exception as e:
+            logger.warning(f"Could not read page count, using end page {self.end_page}: {e}")
+            return self.end_page
+    
+    def iter_page_images(self, pdf_path: str, last_page: Optional[int] = None,
+                         page_numbers: Optional[List[int]] = None) -> Iterator[Tuple[int, Image.Image]]:
+        """Render PDF pages lazily, at most window_size pages at a time
+        
+        page_numbers restricts rendering to those pages (ascending), default is the whole range.
+        """
+        if page_numbers is None:
+            last_page = last_page or self.last_page(pdf_path)
+            page_numbers = list(range(self.start_page, last_page + 1))
+        logger.info(f"Rendering {len(page_numbers)} PDF pages in windows of {self.window_size}")
+        from pdf2image import convert_from_path
+        
+        for first_page, window_last in _page_windows(page_numbers, self.window_size):
+            started = time.perf_counter()
             images = convert_from_path(
                 pdf_path,
-                first_page=self.start_page,
-                last_page=self.end_page,
-                dpi=300,  # High DPI for better OCR
+                first_page=first_page,
+                last_page=window_last,
+                dpi=self.render_dpi,  # High DPI for better OCR (lower first pass in adaptive mode)
                 fmt='PNG'
             )
+            if not images:
+                break
+            self.timings.add('render', time.perf_counter() - started, len(images))
             
-            logger.info(f"Successfully converted {len(images)} pages")
-            return images
+            page_num = first_page
+            while images:
+                # Pop so each page is released as soon as the consumer is done with it
+                yield page_num, images.pop(0)
+                page_num += 1
+    
+    def epub_image_name(self, page_num: int) -> str:
+        return f"images/page_{page_num:03d}.{self.epub_image.extension}"
+    
+    def process_page(self, image: Image.Image, pdf_path: Optional[str] = None,
+                     page_num: Optional[int] = None) -> Tuple[str, bytes, Dict[str, Any]]:
+        """OCR and encode a single rendered page, returning (text, image_bytes, page_info)
+        
+        pdf_path and page_num let adaptive mode re-render the page at full dpi. The EPUB image
+        does not depend on the OCR resolution of the page: it is encoded from a render at
+        epub_image_dpi, which is the first render unless that is lower.
+        """
+        started = time.perf_counter()
+        page_info: Dict[str, Any] = {}
+        
+        # Encode the EPUB image on the helper thread while OCR runs on this one
+        if self._image_encoder is None:
+            self._image_encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='epub-image')
+        image_dpi = self.epub_image_dpi
+        if image_dpi > self.render_dpi and pdf_path is not None and page_num is not None:
+            encoded = self._image_encoder.submit(self._render_page_image, pdf_path, page_num, image_dpi)
+        else:
+            encoded = self._image_encoder.submit(self._encode_page_image, image)
+        
+        # Extract text using OCR
+        rerender = None
+        if self.adaptive_dpi and pdf_path is not None and page_num is not None:
+            rerender = lambda: self.render_page(pdf_path, page_num, self.dpi)
+        text_content = self.extract_text_from_image(image, page_info, rerender)
+        
+        image_data, page_info['image_bytes'] = encoded.result()
+        page_info['seconds'] = time.perf_counter() - started
+        return text_content, image_data, page_info
+    
+    @property
+    def epub_image_dpi(self) -> int:
+        """Resolution the EPUB images are encoded from: the image dpi, at most the OCR dpi
+        
+        With a fixed image width the first render is scaled to it.
+        """
+        if not self.epub_image.dpi:
+            return self.render_dpi
+        return min(self.epub_image.dpi, self.dpi)
+    
+    def _encode_page_image(self, image: Image.Image) -> Tuple[bytes, Dict[str, int]]:
+        with self.timings.time('encode'):
+            return encode_page_image(image, self.epub_image, self.render_dpi)
+    
+    def _render_page_image(self, pdf_path: str, page_num: int, dpi: int) -> Tuple[bytes, Dict[str, int]]:
+        """Render the page again for the EPUB when the first render is below the image dpi"""
+        with self.timings.time('render_image'):
+            image = self.render_page(pdf_path, page_num, dpi)
+        try:
+            with self.timings.time('encode'):
+                return encode_page_image(image, self.epub_image, dpi)
+        finally:
+            image.close()
+    
+    def close(self) -> None:
+        """Release the helper thread and the OCR engine"""
+        if self._image_encoder is not None:
+            self._image_encoder.shutdown(wait=True)
+            self._image_encoder = None
+        if self._ocr_backend is not None:
+            self._ocr_backend.close()
+            self._ocr_backend = None
+    
+    def process_pages(self, pdf_path: str,
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      pdf_hash: Optional[str] = None) -> Iterator[Tuple[int, str, bytes]]:
+        """Render, OCR and encode pages in order, yielding (page_num, text, image_bytes)
+        
+        progress_callback, if given, is called with (pages_done, pages_total) after every page.
+        pdf_hash is the SHA-256 of the PDF if the caller knows it, saves hashing it again.
+        """
+        started = time.perf_counter()
+        page_infos = []
+        self.timings = StageTimings(self.timings.histogram)
+        page_numbers = list(range(self.start_page, self.last_page(pdf_path) + 1))
+        pages_total = len(page_numbers)
+        
+        # Pages finished by an earlier (possibly crashed) run are loaded from their checkpoints
+        checkpoints = CheckpointStore.from_env(pdf_path, self.checkpoint_settings(), self.work_dir, pdf_hash)
+        done = checkpoints.done_pages() & set(page_numbers) if checkpoints else set()
+        missing = [page_num for page_num in page_numbers if page_num not in done]
+        if done:
+            logger.info(f"Reusing {len(done)} checkpointed pages, processing {len(missing)}")
+        
+        if not missing:
+            pages = iter(())
+        elif self.workers > 1 or self.executor is not None:
+            pages = self._process_pages_parallel(pdf_path, missing)
+        else:
+            pages = self._process_pages_serial(pdf_path, missing)
+        pages = self._merge_checkpoints(page_numbers, pages, checkpoints, done)
+        
+        try:
+            for page_num, text_content, image_data, page_info in pages:
+                # Pages from pool workers bring their stage timings along
+                self.timings.merge(page_info.pop('stages', {}))
+                PAGES_TOTAL.inc(source=_page_source(page_info))
+                layout = page_info.get('text_regions')
+                if layout:
+                    OCR_PIXELS_TOTAL.inc(layout['ocr_pixels'], result='ocr')
+                    OCR_PIXELS_TOTAL.inc(layout['pixels'] - layout['ocr_pixels'], result='skipped')
+                page_infos.append(page_info)
+                if progress_callback:
+                    progress_callback(len(page_infos), pages_total)
+                yield page_num, text_content, image_data
+        finally:
+            self.close()
+            if checkpoints is not None:
+                checkpoints.release()
+        
+        self._record_stats(page_infos, time.perf_counter() - started)
+    
+    def _merge_checkpoints(self, page_numbers: List[int], processed: Iterator[Tuple[int, str, bytes, Dict[str, Any]]],
+                           checkpoints: Optional[CheckpointStore], done: set) -> Iterator[Tuple[int, str, bytes, Dict[str, Any]]]:
+        """Interleave checkpointed and freshly processed pages in page order, checkpointing the new ones"""
+        next_processed = next(processed, None)
+        for page_num in page_numbers:
+            if page_num in done:
+                with self.timings.time('checkpoint_load'):
+                    checkpoint = checkpoints.load(page_num)
+                yield (page_num, *checkpoint)
+            elif next_processed is not None and next_processed[0] == page_num:
+                _, text_content, image_data, page_info = next_processed
+                if page_info.get('error'):
+                    logger.warning(f"Page {page_num} failed ({page_info['error']}), not checkpointing it")
+                elif checkpoints is not None:
+                    with self.timings.time('checkpoint_save'):
+                        checkpoints.save(page_num, text_content, image_data, self.epub_image.extension, page_info)
+                yield next_processed
+                next_processed = next(processed, None)
+    
+    def _process_pages_serial(self, pdf_path: str, page_numbers: List[int]) -> Iterator[Tuple[int, str, bytes, Dict[str, Any]]]:
+        """Process pages one at a time in this process"""
+        for page_num, image in self.iter_page_images(pdf_path, page_numbers=page_numbers):
+            logger.info(f"Processing page {page_num}")
+            text_content, image_data, page_info = self.process_page(image, pdf_path, page_num)
+            image.close()
+            yield page_num, text_content, image_data, page_info
+    
+    def _process_pages_parallel(self, pdf_path: str, page_numbers: List[int]) -> Iterator[Tuple[int, str, bytes, Dict[str, Any]]]:
+        """Fan pages out to the worker pool and yield the results in page order"""
+        settings = self.page_settings()
+        from concurrent.futures import ProcessPoolExecutor
+        executor = self.executor or ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_ocr_worker
+        )
+        workers = getattr(executor, '_max_workers', self.workers)
+        logger.info(f"Processing {len(page_numbers)} pages with {workers} workers")
+        
+        # Keep a bounded number of pages in flight so finished-but-unconsumed
+        # results cannot pile up in memory
+        max_in_flight = max(self.window_size, 2 * workers)
+        page_numbers = iter(page_numbers)
+        pending = deque()
+        
+        def submit_next() -> None:
+            page_num = next(page_numbers, None)
+            if page_num is not None:
+                pending.append((page_num, executor.submit(_ocr_page_task, pdf_path, page_num, settings)))
+        
+        try:
+            for _ in range(max_in_flight):
+                submit_next()
             
-        except Exception as e:
-            logger.error(f"PDF conversion error: {e}")
-            return []
+            while pending:
+                page_num, future = pending.popleft()
+                text_content, image_data, page_info = future.result()
+                submit_next()
+                if image_data is None:
+                    # Page beyond the end of the document
+                    continue
+                logger.info(f"Processed page {page_num} ({page_info['seconds']:.2f}s)")
+                yield page_num, text_content, image_data, page_info
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if executor is not self.executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _record_stats(self, page_infos: List[Dict[str, Any]], wall_seconds: float) -> None:
+        """Store and log the throughput of the last conversion"""
+        pages = len(page_infos)
+        page_seconds = [info['seconds'] for info in page_infos]
+        cache_hits = sum(1 for info in page_infos if info.get('ocr_cache') == 'hit')
+        cache_misses = sum(1 for info in page_infos if info.get('ocr_cache') == 'miss')
+        checkpoint_pages = sum(1 for info in page_infos if info.get('checkpoint'))
+        failed_pages = sum(1 for info in page_infos if info.get('error'))
+        preprocess_seconds: Dict[str, float] = {}
+        image_bytes = {'raw': 0, 'resized': 0, 'encoded': 0}
+        layout = {'pages': 0, 'blank_pages': 0, 'cropped_pages': 0, 'pixels': 0, 'ocr_pixels': 0}
+        dpi_tiers: Dict[str, int] = {}
+        for info in page_infos:
+            if 'dpi' in info:
+                dpi_tiers[str(info['dpi'])] = dpi_tiers.get(str(info['dpi']), 0) + 1
+            page_layout = info.get('text_regions')
+            if page_layout:
+                layout['pages'] += 1
+                layout['blank_pages'] += page_layout['blank']
+                layout['cropped_pages'] += 0 < page_layout['ocr_pixels'] < page_layout['pixels']
+                layout['pixels'] += page_layout['pixels']
+                layout['ocr_pixels'] += page_layout['ocr_pixels']
+            for stage, seconds in info.get('preprocess_seconds', {}).items():
+                preprocess_seconds[stage] = preprocess_seconds.get(stage, 0.0) + seconds
+            for name, size in info.get('image_bytes', {}).items():
+                image_bytes[name] += size
+        
+        self.stats = {
+            'pages': pages,
+            'workers': self.workers if self.executor is None else getattr(self.executor, '_max_workers', None),
+            'wall_seconds': round(wall_seconds, 3),
+            'pages_per_second': round(pages / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            'avg_page_seconds': round(sum(page_seconds) / pages, 3) if pages else 0.0,
+            'max_page_seconds': round(max(page_seconds), 3) if pages else 0.0,
+            'ocr_cache': {'hits': cache_hits, 'misses': cache_misses},
+            'checkpoint_pages': checkpoint_pages,
+            'failed_pages': failed_pages,
+            'preprocess_seconds': {stage: round(seconds, 3) for stage, seconds in preprocess_seconds.items()},
+            'stages': self.timings.summary(),
+            'text_regions': self._layout_savings(layout),
+            'dpi': {
+                'adaptive': bool(self.adaptive_dpi),
+                'first_pass': self.render_dpi,
+                'min_confidence': self.min_confidence if self.adaptive_dpi else None,
+                'pages_by_dpi': dict(sorted(dpi_tiers.items(), key=lambda item: int(item[0]))),
+            },
+            'epub_images': {
+                **self.epub_image.as_dict(),
+                'raw_bytes': image_bytes['raw'],
+                'resized_bytes': image_bytes['resized'],
+                'encoded_bytes': image_bytes['encoded'],
+                'saved_by_resize': image_bytes['raw'] - image_bytes['resized'],
+                'saved_by_encoding': image_bytes['resized'] - image_bytes['encoded'],
+                'saved_total': image_bytes['raw'] - image_bytes['encoded'],
+            },
+        }
+        logger.info(f"Processed {pages} pages in {wall_seconds:.1f}s "
+                    f"({self.stats['pages_per_second']} pages/s, "
+                    f"{self.stats['avg_page_seconds']}s per page, "
+                    f"OCR cache {cache_hits} hits / {cache_misses} misses)")
+    
+    def _layout_savings(self, layout: Dict[str, int]) -> Dict[str, Any]:
+        """Pixels kept away from OCR by the layout pre-pass and the OCR time that saved
+        
+        The time is an estimate: skipped pixels at the OCR seconds per pixel measured in this run.
+        """
+        pixels_saved = layout['pixels'] - layout['ocr_pixels']
+        ocr_seconds = self.timings.totals().get('ocr', 0.0)
+        seconds_saved = pixels_saved * ocr_seconds / layout['ocr_pixels'] if layout['ocr_pixels'] else 0.0
+        OCR_SECONDS_SAVED.inc(seconds_saved)
+        return {
+            **layout,
+            'pixels_saved': pixels_saved,
+            'saved_ratio': round(pixels_saved / layout['pixels'], 3) if layout['pixels'] else 0.0,
+            'estimated_seconds_saved': round(seconds_saved, 3),
+        }
+    
+    def render_chapter_html(self, page_num: int, text_content: str) -> str:
+        """Render the XHTML document of a chapter with interlinear text and image"""
+        translate = self.translate_word if self.vocabulary else None
+        return render_chapter(page_num, text_content, self.epub_image_name(page_num), translate)
     
     def create_epub_chapter(self, page_num: int, text_content: str, image_data: bytes) -> epub.EpubHtml:
         """Create an EPUB chapter with interlinear text and image"""
-        chapter_id = f"chapter_{page_num:03d}"
-        chapter_title = f"Seite {page_num}"
-        
-        # Process text for interlinear display
-        interlinear_html = self.create_interlinear_html(text_content)
-        
-        # Create HTML content with interlinear support
-        html_content = f"""
-        <!DOCTYPE html>
-        <html xmlns="http://www.w3.org/1999/xhtml" lang="ar">
-        <head>
-            <title>{chapter_title}</title>
-            <link rel="stylesheet" type="text/css" href="styles.css"/>
-            <meta charset="utf-8"/>
-            <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
-        </head>
-        <body>
-            <div class="chapter">
-                <h2 class="chapter-title">{chapter_title}</h2>
-                
-                <div class="page-container">
-                    <div class="image-container">
-                        <img src="images/page_{page_num:03d}.png" alt="Seite {page_num}" class="page-image"/>
-                    </div>
-                    
-                    <div class="text-container">
-                        <!-- Original Arabic text (hidden, used for audio) -->
-                        <div class="arabic-text" dir="rtl" style="display: none;">
-                            {text_content.replace(chr(10), '<br>')}
-                        </div>
-                        
-                        <!-- Interlinear text container -->
-                        <div class="interlinear-container">
-                            <div class="interlinear-toggle">
-                                <span>Deutsche Übersetzung:</span>
-                                <div class="toggle-switch active" onclick="toggleInterlinear()"></div>
-                                <span>An</span>
-                            </div>
-                            
-                            <div class="interlinear-text-container">
-                                {interlinear_html}
-                            </div>
-                        </div>
-                        
-                        <div class="interaction-controls">
-                            <button class="btn btn-audio" onclick="playAudio()">🔊 Audio abspielen</button>
-                            <button class="btn btn-translate" onclick="toggleInterlinear()">🔄 Interlinear umschalten</button>
-                            <button class="btn btn-tashkeel" onclick="toggleTashkeel()">📝 Tashkeel umschalten</button>
-                            <button class="btn btn-vocab" onclick="addToFlashcards()">📚 Ausgewählte Wörter hinzufügen</button>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            
-            <script type="text/javascript" src="script.js"></script>
-        </body>
-        </html>
-        """
-        
-        # Create chapter
+        from ebooklib import epub
         chapter = epub.EpubHtml(
-            title=chapter_title,
-            file_name=f"{chapter_id}.xhtml",
+            title=f"Seite {page_num}",
+            file_name=f"chapter_{page_num:03d}.xhtml",
             lang="ar"
         )
-        chapter.content = html_content
+        chapter.content = self.render_chapter_html(page_num, text_content)
         
         return chapter
     
     def create_interlinear_html(self, text_content: str) -> str:
         """Create HTML for interlinear word-by-word display"""
-        if not text_content.strip():
-            return "<p>Kein Text erkannt</p>"
-        
-        # Split into words (handle Arabic word boundaries)
-        import re
-        words = re.findall(r'\S+', text_content)
-        
-        interlinear_html = ""
+        return render_interlinear(text_content, self.translate_word if self.vocabulary else None)
+    
+    def translate_word(self, word: str) -> Optional[str]:
+        """German translation of a (display order) OCR word from the vocabulary index"""
+        translation = self.vocabulary.lookup(word, visual=True)
+        self.vocabulary_stats['lookups'] += 1
+        if translation is not None:
+            self.vocabulary_stats['hits'] += 1
+        VOCABULARY_LOOKUPS.inc(result='hit' if translation is not None else 'miss')
+        return translation
+    
+    def create_epub_book(self, pdf_path: str, output_path: str,
+                         progress_callback: Optional[Callable[[int, int], None]] = None,
+                         pdf_hash: Optional[str] = None, incomplete_path: Optional[str] = None) -> bool:
+        """Create EPUB book from PDF
         
-        for i, word in enumerate(words):
-            # Clean word (remove punctuation for processing)
-            clean_word = re.sub(r'[^\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]', '', word)
-            
-            if clean_word:
-                interlinear_html += f'''
-                <div class="interlinear-word clickable-word" data-word="{clean_word}" data-index="{i}">
-                    <span class="arabic-word">{word}</span>
-                    <span class="german-translation">...</span>
-                </div>
-                '''
-            else:
-                # Handle punctuation or non-Arabic characters
-                interlinear_html += f'''
-                <div class="interlinear-word">
-                    <span class="arabic-word">{word}</span>
-                    <span class="german-translation"></span>
-                </div>
-                '''
-        
-        return interlinear_html
-    
-    def create_epub_book(self, pdf_path: str, output_path: str) -> bool:
-        """Create EPUB book from PDF"""
+        With incomplete_path, a book with pages that failed OCR is moved there instead, so
+        nothing unfinished ever appears at output_path.
+        """
         try:
-            # Convert PDF to images
-            images = self.pdf_to_images(pdf_path)
-            if not images:
-                logger.error("No images extracted from PDF")
-                return False
-            
-            # Create new EPUB book
-            book = epub.EpubBook()
+            if self.epub_writer == 'streaming':
+                chapters = self._write_epub_streaming(pdf_path, output_path, progress_callback, pdf_hash,
+                                                      incomplete_path)
+            else:
+                chapters = self._write_epub_ebooklib(pdf_path, output_path, progress_callback, pdf_hash,
+                                                     incomplete_path)
             
-            # Set metadata
-            book.set_identifier('arabic-learning-book-001')
-            book.set_title('Arabisches Lernbuch')
-            book.set_language('ar')
-            book.add_author('ArabicAI Learning Platform')
+            if not chapters:
+                logger.error("No pages extracted from PDF")
+                return False
             
-            # Add CSS styles
-            with open('pdf_converter/styles.css', 'r', encoding='utf-8') as f:
-                css_content = f.read()
+            # Include writing the package document, which happens after the last page
+            if self.stats:
+                self.stats['stages'] = self.timings.summary()
+                self.stats['vocabulary'] = self.vocabulary_report()
+            logger.info(f"EPUB created successfully: {self._finished_path(output_path, incomplete_path)}")
+            return True
             
-            nav_css = epub.EpubItem(
-                uid="nav_css",
-                file_name="styles.css",
-                media_type="text/css",
-                content=css_content
-            )
-            book.add_item(nav_css)
+        except Exception as e:
+            logger.error(f"EPUB creation error: {e}")
+            return False
+    
+    def vocabulary_report(self) -> Dict[str, Any]:
+        """Share of the interlinear words that got a translation from the vocabulary index"""
+        lookups, hits = self.vocabulary_stats['lookups'], self.vocabulary_stats['hits']
+        return {
+            'entries': len(self.vocabulary) if self.vocabulary else 0,
+            'lookups': lookups,
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+        }
+    
+    def _finished_path(self, output_path: str, incomplete_path: Optional[str]) -> str:
+        """Where the written EPUB goes once all pages are processed"""
+        if incomplete_path and self.stats.get('failed_pages'):
+            return incomplete_path
+        return output_path
+    
+    def _read_asset(self, name: str) -> str:
+        with open(ASSET_DIR / name, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def _write_epub_streaming(self, pdf_path: str, output_path: str,
+                              progress_callback: Optional[Callable[[int, int], None]],
+                              pdf_hash: Optional[str] = None, incomplete_path: Optional[str] = None) -> int:
+        """Append each page to the EPUB zip as soon as it is processed; returns the chapter count"""
+        with StreamingEpubWriter(output_path, BOOK_IDENTIFIER, BOOK_TITLE, BOOK_LANGUAGE, BOOK_AUTHOR) as writer:
+            writer.add_item("nav_css", "styles.css", "text/css", self._read_asset('styles.css'))
+            writer.add_item("script_js", "script.js", "application/javascript", self._read_asset('script.js'))
             
-            # Add JavaScript
-            with open('pdf_converter/script.js', 'r', encoding='utf-8') as f:
-                js_content = f.read()
+            for page_num, text_content, image_data in self.process_pages(pdf_path, progress_callback, pdf_hash):
+                with self.timings.time('epub_write'):
+                    # Images are already compressed, store them as they are
+                    writer.add_item(f"image_{page_num:03d}", self.epub_image_name(page_num),
+                                    self.epub_image.media_type, image_data, compress=False)
+                    writer.add_chapter(f"chapter_{page_num:03d}", f"chapter_{page_num:03d}.xhtml",
+                                       f"Seite {page_num}", self.render_chapter_html(page_num, text_content))
             
-            script_js = epub.EpubItem(
-                uid="script_js",
-                file_name="script.js",
-                media_type="application/javascript",
-                content=js_content
+            chapters = writer.chapter_count
+            if not chapters:
+                writer.abort()
+            else:
+                with self.timings.time('epub_finalize', pages=chapters):
+                    writer.close(self._finished_path(output_path, incomplete_path))
+            return chapters
+    
+    def _write_epub_ebooklib(self, pdf_path: str, output_path: str,
+                             progress_callback: Optional[Callable[[int, int], None]],
+                             pdf_hash: Optional[str] = None, incomplete_path: Optional[str] = None) -> int:
+        """Build the whole book in memory with ebooklib and write it at the end; returns the chapter count"""
+        from ebooklib import epub
+        
+        # Create new EPUB book
+        book = epub.EpubBook()
+        
+        # Set metadata
+        book.set_identifier(BOOK_IDENTIFIER)
+        book.set_title(BOOK_TITLE)
+        book.set_language(BOOK_LANGUAGE)
+        book.add_author(BOOK_AUTHOR)
+        
+        # Add CSS styles
+        nav_css = epub.EpubItem(
+            uid="nav_css",
+            file_name="styles.css",
+            media_type="text/css",
+            content=self._read_asset('styles.css')
+        )
+        book.add_item(nav_css)
+        
+        # Add JavaScript
+        script_js = epub.EpubItem(
+            uid="script_js",
+            file_name="script.js",
+            media_type="application/javascript",
+            content=self._read_asset('script.js')
+        )
+        book.add_item(script_js)
+        
+        chapters = []
+        
+        # Process pages as they are rendered; only the current window is held in memory
+        for page_num, text_content, image_data in self.process_pages(pdf_path, progress_callback, pdf_hash):
+            # Add image to EPUB
+            img_item = epub.EpubItem(
+                uid=f"image_{page_num:03d}",
+                file_name=self.epub_image_name(page_num),
+                media_type=self.epub_image.media_type,
+                content=image_data
             )
-            book.add_item(script_js)
-            
-            chapters = []
+            book.add_item(img_item)
             
-            # Process each page
-            for i, image in enumerate(images):
-                page_num = self.start_page + i
-                logger.info(f"Processing page {page_num}")
-                
-                # Extract text using OCR
-                text_content = self.extract_text_from_image(image)
-                
-                # Save image to bytes
-                from io import BytesIO
-                img_buffer = BytesIO()
-                image.save(img_buffer, format='PNG')
-                image_data = img_buffer.getvalue()
-                
-                # Add image to EPUB
-                img_item = epub.EpubItem(
-                    uid=f"image_{page_num:03d}",
-                    file_name=f"images/page_{page_num:03d}.png",
-                    media_type="image/png",
-                    content=image_data
-                )
-                book.add_item(img_item)
-                
-                # Create chapter
+            # Create chapter
+            with self.timings.time('epub_write'):
                 chapter = self.create_epub_chapter(page_num, text_content, image_data)
-                book.add_item(chapter)
-                chapters.append(chapter)
-            
-            # Create table of contents
-            book.toc = [(epub.Link(f"chapter_{self.start_page + i:03d}.xhtml", f"Seite {self.start_page + i}", f"chapter_{self.start_page + i:03d}"), chapters[i]) for i in range(len(chapters))]
-            
-            # Add navigation files
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-            
-            # Create spine
-            book.spine = ['nav'] + chapters
-            
-            # Write EPUB file
-            epub.write_epub(output_path, book, {})
-            
-            logger.info(f"EPUB created successfully: {output_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"EPUB creation error: {e}")
-            return False
+            book.add_item(chapter)
+            chapters.append((page_num, chapter))
+        
+        if not chapters:
+            return 0
+        
+        # Create table of contents
+        book.toc = [epub.Link(f"chapter_{page_num:03d}.xhtml", f"Seite {page_num}", f"chapter_{page_num:03d}") for page_num, _ in chapters]
+        
+        # Add navigation files
+        book.add_item(epub.EpubNcx())
+        book.add_item(epub.EpubNav())
+        
+        # Create spine
+        book.spine = ['nav'] + [chapter for _, chapter in chapters]
+        
+        # Write EPUB file next to the target and move it into place, like StreamingEpubWriter,
+        # so a failed write never leaves a truncated EPUB at output_path
+        part_path = f"{output_path}.part"
+        try:
+            with self.timings.time('epub_finalize', pages=len(chapters)):
+                epub.write_epub(part_path, book, {})
+            os.replace(part_path, self._finished_path(output_path, incomplete_path))
+        except Exception:
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+            raise
+        return len(chapters)
 
-# Flask Web API
-app = Flask(__name__)
-CORS(app)
+def _page_source(page_info: Dict[str, Any]) -> str:
+    """Where a page's text came from, for the pages counter"""
+    if page_info.get('error'):
+        return 'error'
+    if page_info.get('checkpoint'):
+        return 'checkpoint'
+    if page_info.get('ocr_cache') == 'hit':
+        return 'ocr_cache'
+    if page_info.get('text_regions', {}).get('blank'):
+        return 'blank'
+    return 'ocr'
+
+def _page_windows(page_numbers: List[int], window_size: int) -> Iterator[Tuple[int, int]]:
+    """Split ascending page numbers into contiguous (first, last) runs of at most window_size pages"""
+    first = last = None
+    for page_num in page_numbers:
+        if first is not None and page_num == last + 1 and page_num - first < window_size:
+            last = page_num
+            continue
+        if first is not None:
+            yield first, last
+        first = last = page_num
+    if first is not None:
+        yield first, last
 
-UPLOAD_FOLDER = 'uploads'
-OUTPUT_FOLDER = 'output'
+# Per-process converters used by the OCR worker pool, keyed by their settings
+_worker_converters: Dict[str, PDFToEpubConverter] = {}
+
+def _init_ocr_worker() -> None:
+    """Pool initializer: keep Tesseract single-threaded, the pool provides the parallelism"""
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+def _ocr_page_task(pdf_path: str, page_num: int, settings: Dict[str, Any]) -> Tuple[str, Optional[bytes], Dict[str, Any]]:
+    """Render, OCR and encode a single page inside a pool worker"""
+    key = json.dumps(settings, sort_keys=True)
+    converter = _worker_converters.get(key)
+    if converter is None:
+        converter = _worker_converters[key] = PDFToEpubConverter(**settings)
+    # Stage times go back to the parent with the page, which records them
+    converter.timings = StageTimings(histogram=None)
+    
+    started = time.perf_counter()
+    with converter.timings.time('render'):
+        image = converter.render_page(pdf_path, page_num)
+    if image is None:
+        return "", None, {'seconds': 0.0}
+    
+    text_content, image_data, page_info = converter.process_page(image, pdf_path, page_num)
+    image.close()
+    page_info['seconds'] = time.perf_counter() - started
+    page_info['stages'] = converter.timings.totals()
+    return text_content, image_data, page_info
+
+# Flask Web API
 ALLOWED_EXTENSIONS = {'pdf'}
 
-# Create directories
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+def default_config() -> Dict[str, Any]:
+    """Server settings from the environment, create_app(config) overrides single keys"""
+    return {
+        'UPLOAD_FOLDER': os.environ.get('PDF_UPLOAD_DIR', 'uploads'),
+        'OUTPUT_FOLDER': os.environ.get('PDF_OUTPUT_DIR', 'output'),
+        # Job state shared by all server processes (default: OUTPUT_FOLDER/jobs)
+        'JOB_STATE_DIR': os.environ.get('PDF_JOB_STATE_DIR'),
+        'JOB_QUEUE_SIZE': int(os.environ.get('PDF_JOB_QUEUE_SIZE', '16')),
+        'JOB_CONCURRENCY': int(os.environ.get('PDF_JOB_CONCURRENCY', '1')),
+        # Admission control: pages of all queued and running jobs, estimated memory of the
+        # running ones (all server processes together) and pages per job
+        'ADMISSION_MAX_PAGES': int(os.environ.get('PDF_ADMISSION_MAX_PAGES', '1000')),
+        'ADMISSION_MAX_MEMORY_MB': int(os.environ.get('PDF_ADMISSION_MAX_MEMORY_MB', '4096')),
+        'MAX_JOB_PAGES': int(os.environ.get('PDF_MAX_JOB_PAGES', '500')),
+        # Starting guess for Retry-After, replaced by the measured speed
+        'ADMISSION_SECONDS_PER_PAGE': float(os.environ.get('PDF_ADMISSION_SECONDS_PER_PAGE', '3')),
+        # Let a front-end server (Apache, lighttpd) send the files itself
+        'USE_X_SENDFILE': os.environ.get('PDF_USE_X_SENDFILE', '') == '1',
+    }
+
+class HashingUpload:
+    """Spool file for an upload in the upload folder that hashes the data as it is written
+    
+    The file is removed on close unless it has been moved into place first.
+    """
+    
+    def __init__(self, directory: str):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+    
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        return self._file.write(data)
+    
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+    
+    def close(self) -> None:
+        self._file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+    
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+class UploadRequest(Request):
+    """Writes uploaded files to disk chunk by chunk instead of buffering them in memory"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUpload(current_app.config['UPLOAD_FOLDER'])
+
+api = Blueprint('api', __name__)
+
+def job_manager() -> JobManager:
+    return current_app.extensions['job_manager']
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/convert', methods=['POST'])
+def epub_image_options(form) -> Optional[Dict[str, Any]]:
+    """EPUB image settings from the optional image_* form fields, None to use the defaults"""
+    fields = {
+        'image_format': ('image_format', str),
+        'image_dpi': ('dpi', int),
+        'image_width': ('width', int),
+        'image_quality': ('quality', int),
+    }
+    if not any(form.get(field) for field in fields):
+        return None
+    
+    options = EpubImageSettings.from_env().as_dict()
+    for field, (name, convert) in fields.items():
+        if form.get(field):
+            options[name] = convert(form[field])
+    # Validate now so a bad value is a 400, not a failed job
+    EpubImageSettings(**options)
+    return options
+
+def store_upload(file, upload_folder: str, chunk_size: int = 1024 * 1024) -> Tuple[str, str]:
+    """Save an upload under its content hash, returning (pdf_path, sha256)
+    
+    Identical PDFs end up in the same file whatever their name, and a new upload
+    never overwrites a PDF a running job is reading.
+    """
+    stream = file.stream
+    if isinstance(stream, HashingUpload):
+        # Already spooled to the upload folder and hashed while the request was parsed
+        stream.flush()
+        pdf_hash = stream.hexdigest()
+        tmp_path = stream.path
+    else:
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(chunk_size), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        pdf_hash = digest.hexdigest()
+    
+    pdf_path = os.path.join(upload_folder, f"{pdf_hash}.pdf")
+    if os.path.exists(pdf_path):
+        os.unlink(tmp_path)
+    else:
+        os.replace(tmp_path, pdf_path)
+    return pdf_path, pdf_hash
+
+def content_etag(path: str) -> str:
+    """SHA-256 of a file, cached in a .sha256 file next to it until the file changes"""
+    sidecar = f"{path}.sha256"
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(path):
+            with open(sidecar) as f:
+                return f.read().strip()
+    except OSError:
+        pass
+    etag = file_sha256(path)
+    # Written next to it and renamed, so a concurrent download never reads a partial ETag
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.sha256.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(etag)
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return etag
+
+def run_conversion_job(job: Job) -> None:
+    """Run a queued conversion on a job worker thread"""
+    converter = PDFToEpubConverter(job.start_page, job.end_page, workers=job.options.get('workers'),
+                                   epub_image=job.options.get('epub_image'))
+    # Pages with OCR errors are empty; such an EPUB never reaches the result cache path,
+    # so the next identical request converts again instead of serving it
+    stem, extension = os.path.splitext(job.epub_path)
+    incomplete_path = f"{stem}_incomplete_{job.id[:8]}{extension}"
+    success = converter.create_epub_book(job.pdf_path, job.epub_path, job.update_progress,
+                                         job.options.get('pdf_hash'), incomplete_path)
+    job.result = {'throughput': converter.stats}
+    JOBS_TOTAL.inc(state=FINISHED if success else FAILED)
+    
+    if success and converter.stats.get('failed_pages'):
+        job.epub_path = incomplete_path
+        logger.warning(f"Job {job.id}: {converter.stats['failed_pages']} pages failed OCR, EPUB is not cached")
+    
+    if success:
+        # Hash now, so the first download does not have to
+        content_etag(job.epub_path)
+        job.download_url = f'/download/{os.path.basename(job.epub_path)}'
+    else:
+        job.state = FAILED
+        job.error = 'Konvertierung fehlgeschlagen'
+
+@api.route('/convert', methods=['POST'])
 def convert_pdf():
     """API endpoint to convert PDF to EPUB"""
     try:
@@ -344,57 +1073,189 @@ def convert_pdf():
             return jsonify({'error': 'Nur PDF-Dateien sind erlaubt'}), 400
         
         # Get parameters
-        start_page = int(request.form.get('start_page', 30))
-        end_page = int(request.form.get('end_page', 180))
+        try:
+            start_page = int(request.form.get('start_page', 30))
+            end_page = int(request.form.get('end_page', 180))
+            workers = request.form.get('workers')
+            workers = clamp_worker_count(int(workers)) if workers else None
+        except ValueError:
+            return jsonify({'error': 'Seiten und Worker müssen ganze Zahlen sein'}), 400
+        admission = job_manager().admission
+        try:
+            admission.check_range(start_page, end_page)
+        except AdmissionError as e:
+            return admission_response(e)
+        try:
+            epub_image = epub_image_options(request.form)
+        except ValueError as e:
+            return jsonify({'error': f'Ungültige Bildeinstellungen: {e}'}), 400
         
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        pdf_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(pdf_path)
+        # Save uploaded file under its content hash
+        pdf_path, pdf_hash = store_upload(file, current_app.config['UPLOAD_FOLDER'])
+        options = {'workers': workers, 'epub_image': epub_image, 'pdf_hash': pdf_hash}
         
-        # Create output filename
-        epub_filename = f"{Path(filename).stem}_pages_{start_page}-{end_page}.epub"
-        epub_path = os.path.join(OUTPUT_FOLDER, epub_filename)
+        # Output name is derived from content, range and settings, so a finished
+        # conversion is found again for any later identical request
+        converter = PDFToEpubConverter(start_page, end_page, workers=workers, epub_image=epub_image)
+        result_key = converter.result_key(pdf_hash)
+        epub_filename = f"pages_{start_page}-{end_page}_{result_key[:24]}.epub"
+        epub_path = os.path.join(current_app.config['OUTPUT_FOLDER'], epub_filename)
         
-        # Convert PDF to EPUB
-        converter = PDFToEpubConverter(start_page, end_page)
-        success = converter.create_epub_book(pdf_path, epub_path)
+        # The requested end page clamped to the pages this PDF actually has
+        last_page = converter.last_page(pdf_path)
+        if last_page < start_page:
+            return jsonify({'error': f'Die PDF hat nur {last_page} Seiten'}), 400
         
-        if success:
+        if os.path.exists(epub_path):
+            logger.info(f"Serving existing conversion {epub_filename}")
             return jsonify({
                 'success': True,
-                'message': 'PDF erfolgreich zu EPUB konvertiert',
+                'cached': True,
+                'message': 'Konvertierung bereits vorhanden',
                 'download_url': f'/download/{epub_filename}',
-                'pages_processed': end_page - start_page + 1
+                'pages_total': last_page - start_page + 1
             })
-        else:
-            return jsonify({'error': 'Konvertierung fehlgeschlagen'}), 500
+        
+        # Cost of these pages, checked against the server's budgets
+        cost = estimate_cost(last_page - start_page + 1, converter.dpi, converter.workers, converter.window_size)
+        
+        # Queue the conversion and return immediately; identical requests join the running job
+        job = Job(pdf_path, epub_path, start_page, end_page, options, key=result_key, cost=cost)
+        try:
+            admission.check_job(cost)
+            job = job_manager().submit(job)
+        except AdmissionError as e:
+            return admission_response(e)
+        except QueueFullError:
+            response = jsonify({'error': 'Zu viele Konvertierungen in der Warteschlange, bitte später erneut versuchen'})
+            response.headers['Retry-After'] = '60'
+            return response, 503
+        
+        return jsonify({
+            'success': True,
+            'message': 'Konvertierung gestartet',
+            'job_id': job.id,
+            'status_url': f'/jobs/{job.id}',
+            'pages_total': job.pages_total
+        }), 202
             
     except Exception as e:
         logger.error(f"Conversion error: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/download/<filename>')
+def admission_response(error: AdmissionError):
+    """Error response for a rejected conversion, with Retry-After when it may succeed later"""
+    JOBS_REJECTED.inc(reason=error.reason)
+    response = jsonify({'error': str(error)})
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status
+
+@api.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report state, progress, ETA and download URL of a conversion job (of any server process)"""
+    job = job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Auftrag nicht gefunden'}), 404
+    return jsonify(job.to_dict())
+
+@api.route('/download/<filename>')
 def download_file(filename):
-    """Download converted EPUB file"""
+    """Download converted EPUB file
+    
+    Answers range requests (resumed downloads) and conditional requests via a
+    strong content ETag and Last-Modified.
+    """
     try:
-        file_path = os.path.join(OUTPUT_FOLDER, filename)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
+        file_path = safe_join(os.path.abspath(current_app.config['OUTPUT_FOLDER']), filename)
+        if file_path and filename.endswith('.epub') and os.path.isfile(file_path):
+            return send_file(file_path, mimetype='application/epub+zip', as_attachment=True,
+                             etag=content_etag(file_path), conditional=True)
         else:
             return jsonify({'error': 'Datei nicht gefunden'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/status')
+@api.route('/metrics')
+def metrics():
+    """Per-stage latency histograms and page/job counters in the Prometheus text format
+    
+    Counters are per server process; with several workers each scrape sees one of them.
+    """
+    QUEUED_JOBS.set(job_manager().queue_size())
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/status')
 def status():
     """API status endpoint"""
     return jsonify({
         'status': 'running',
         'service': 'PDF to EPUB Converter',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'queued_jobs': job_manager().queue_size(),
+        'admission': job_manager().admission.usage(job_manager().active_jobs()),
     })
 
+@api.route('/healthz')
+def healthz():
+    """Liveness: the process answers requests; touches no locks, files or OCR state"""
+    return jsonify({'status': 'ok'})
+
+@api.route('/readyz')
+def readyz():
+    """Readiness: folders writable, OCR available and room in this process's job queue"""
+    config = current_app.config
+    checks = {
+        'folders': all(os.access(config[name], os.W_OK) for name in ('UPLOAD_FOLDER', 'OUTPUT_FOLDER', 'JOB_STATE_DIR')),
+        'ocr': config['OCR_AVAILABLE'],
+        'queue': not job_manager().queue_full(),
+    }
+    ready = all(checks.values())
+    return jsonify({'status': 'ready' if ready else 'not ready', 'checks': checks}), 200 if ready else 503
+
+def ocr_available() -> bool:
+    """Whether an OCR engine can be loaded: tesserocr or the tesseract binary"""
+    try:
+        import tesserocr  # noqa: F401
+        return True
+    except ImportError:
+        return shutil.which('tesseract') is not None
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
+    """Create the web app; folders and the job manager are set up here, not at import
+    
+    Every server process (e.g. gunicorn worker) creates its own app with its own job
+    threads; job state goes through JOB_STATE_DIR so any process can answer for any job.
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    if not app.config['JOB_STATE_DIR']:
+        app.config['JOB_STATE_DIR'] = os.path.join(app.config['OUTPUT_FOLDER'], 'jobs')
+    for name in ('UPLOAD_FOLDER', 'OUTPUT_FOLDER', 'JOB_STATE_DIR'):
+        os.makedirs(app.config[name], exist_ok=True)
+    app.config.setdefault('OCR_AVAILABLE', ocr_available())
+    
+    app.request_class = UploadRequest
+    admission = AdmissionController(
+        max_pages=app.config['ADMISSION_MAX_PAGES'],
+        max_memory_mb=app.config['ADMISSION_MAX_MEMORY_MB'],
+        max_job_pages=app.config['MAX_JOB_PAGES'],
+        seconds_per_page=app.config['ADMISSION_SECONDS_PER_PAGE'],
+    )
+    app.extensions['job_manager'] = JobManager(
+        run_conversion_job,
+        max_queue=app.config['JOB_QUEUE_SIZE'],
+        concurrency=app.config['JOB_CONCURRENCY'],
+        store=JobStore(app.config['JOB_STATE_DIR']),
+        admission=admission,
+    )
+    app.register_blueprint(api)
+    CORS(app)
+    return app
+
 if __name__ == '__main__':
+    # Development server; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
     logger.info("Starting PDF to EPUB Converter Service")
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=int(os.environ.get('PORT', '5001')),
+                     debug=os.environ.get('PDF_DEBUG') == '1', threaded=True)
\ No newline at end of file
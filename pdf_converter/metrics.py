@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Conversion metrics
+Per-stage timers plus a small Prometheus-compatible registry served on /metrics
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; pages take anywhere from milliseconds (cache hits) to a minute (dense OCR at high dpi)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._label_values(labels)] = value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket, sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'pdf_converter_stage_seconds', 'Time per page spent in each conversion stage', ['stage']))
+PAGES_TOTAL = REGISTRY.register(Counter(
+    'pdf_converter_pages_total', 'Pages converted, by where the text came from', ['source']))
+JOBS_TOTAL = REGISTRY.register(Counter(
+    'pdf_converter_jobs_total', 'Finished conversion jobs', ['state']))
+VOCABULARY_LOOKUPS = REGISTRY.register(Counter(
+    'pdf_converter_vocabulary_lookups_total', 'Interlinear words looked up in the vocabulary index', ['result']))
+OCR_PIXELS_TOTAL = REGISTRY.register(Counter(
+    'pdf_converter_ocr_pixels_total', 'Preprocessed page pixels, by whether the layout pre-pass sent them to OCR',
+    ['result']))
+OCR_SECONDS_SAVED = REGISTRY.register(Counter(
+    'pdf_converter_ocr_seconds_saved_total', 'Estimated OCR seconds saved by skipping blank pages and margins'))
+QUEUED_JOBS = REGISTRY.register(Gauge(
+    'pdf_converter_queued_jobs', 'Conversion jobs waiting in the queue'))
+JOBS_REJECTED = REGISTRY.register(Counter(
+    'pdf_converter_jobs_rejected_total', 'Conversion requests turned away by admission control', ['reason']))
+
+class StageTimings:
+    """Seconds spent per conversion stage, also fed into a histogram if one is given
+
+    Stages that cover several pages at once (rendering a window) are recorded
+    with their page count and observed as the average per page.
+    """
+
+    def __init__(self, histogram: Optional[Histogram] = STAGE_SECONDS):
+        self.histogram = histogram
+        self._seconds: Dict[str, float] = {}
+        self._pages: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str, pages: int = 1) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started, pages)
+
+    def add(self, stage: str, seconds: float, pages: int = 1) -> None:
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._pages[stage] = self._pages.get(stage, 0) + pages
+        if self.histogram is not None and pages > 0:
+            for _ in range(pages):
+                self.histogram.observe(seconds / pages, stage=stage)
+
+    def merge(self, seconds_by_stage: Dict[str, float]) -> None:
+        """Add the per-page totals of a page processed in another process"""
+        for stage, seconds in seconds_by_stage.items():
+            self.add(stage, seconds)
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: total seconds, pages and average seconds per page"""
+        with self._lock:
+            return {
+                stage: {
+                    'seconds': round(seconds, 3),
+                    'pages': self._pages[stage],
+                    'avg_page_seconds': round(seconds / self._pages[stage], 4) if self._pages[stage] else 0.0,
+                }
+                for stage, seconds in self._seconds.items()
+            }
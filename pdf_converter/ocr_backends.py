@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+OCR backends
+A long-lived in-process Tesseract engine (tesserocr) with a pytesseract fallback
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import importlib.util
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('auto', 'tesserocr', 'pytesseract')
+
+def parse_tesseract_config(config: str) -> Tuple[str, Optional[int], Optional[int], Dict[str, str]]:
+    """Split a tesseract command line config into (lang, psm, oem, variables)"""
+    lang = 'eng'
+    psm = None
+    oem = None
+    variables = {}
+
+    args = shlex.split(config)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == '-l' and value is not None:
+            lang = value
+            i += 1
+        elif arg == '--psm' and value is not None:
+            psm = int(value)
+            i += 1
+        elif arg == '--oem' and value is not None:
+            oem = int(value)
+            i += 1
+        elif arg == '-c' and value is not None and '=' in value:
+            name, _, setting = value.partition('=')
+            variables[name] = setting
+            i += 1
+        i += 1
+
+    return lang, psm, oem, variables
+
+class OCRBackend:
+    """Turns a preprocessed page (grayscale or binary array) into text"""
+
+    name = 'base'
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: np.ndarray) -> Tuple[str, Optional[float]]:
+        """Text plus Tesseract's mean word confidence (0-100), None if there are no words"""
+        return self.image_to_string(image), None
+
+    def close(self) -> None:
+        """Release the engine"""
+
+class PytesseractBackend(OCRBackend):
+    """Runs the tesseract binary once per page (new process, temp image file)"""
+
+    name = 'pytesseract'
+
+    def __init__(self, config: str):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self.config = config
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        return self._pytesseract.image_to_string(image, config=self.config)
+
+    def image_to_data(self, image: np.ndarray) -> Tuple[str, Optional[float]]:
+        # One tesseract run: the TSV output carries the words with their confidences,
+        # lines are rebuilt from it in the order tesseract reports them
+        data = self._pytesseract.image_to_data(image, config=self.config, output_type=self._pytesseract.Output.DICT)
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confidences = []
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            if confidence < 0 or not word.strip():
+                continue
+            lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(word)
+            confidences.append(confidence)
+        text = '\n'.join(' '.join(words) for words in lines.values())
+        return text, sum(confidences) / len(confidences) if confidences else None
+
+class TesserocrBackend(OCRBackend):
+    """Keeps one Tesseract engine loaded through the C API and feeds it raw pixels"""
+
+    name = 'tesserocr'
+
+    def __init__(self, config: str):
+        import tesserocr
+        lang, psm, oem, variables = parse_tesseract_config(config)
+
+        kwargs = {'lang': lang}
+        if psm is not None:
+            kwargs['psm'] = psm
+        if oem is not None:
+            kwargs['oem'] = oem
+        if os.environ.get('TESSDATA_PREFIX'):
+            kwargs['path'] = os.environ['TESSDATA_PREFIX']
+
+        # Loads the traineddata once for the lifetime of the backend
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        for name, value in variables.items():
+            self.api.SetVariable(name, value)
+
+    def _set_image(self, image: np.ndarray) -> None:
+        import numpy as np
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        self.api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        self._set_image(image)
+        text = self.api.GetUTF8Text()
+        self.api.Clear()
+        return text
+
+    def image_to_data(self, image: np.ndarray) -> Tuple[str, Optional[float]]:
+        # The confidence comes from the recognition GetUTF8Text already ran
+        self._set_image(image)
+        text = self.api.GetUTF8Text()
+        confidence = float(self.api.MeanTextConf()) if text.strip() else None
+        self.api.Clear()
+        return text, confidence
+
+    def close(self) -> None:
+        self.api.End()
+
+def create_backend(name: str, config: str) -> OCRBackend:
+    """Create an OCR backend; 'auto' prefers tesserocr and falls back to pytesseract"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name}")
+
+    if name in ('auto', 'tesserocr'):
+        try:
+            return TesserocrBackend(config)
+        except (ImportError, RuntimeError) as e:
+            if name == 'tesserocr':
+                raise
+            logger.info(f"tesserocr unavailable ({e}), using pytesseract")
+
+    return PytesseractBackend(config)
+
+def resolve_backend_name(name: str) -> str:
+    """Concrete backend for name without loading Tesseract: 'auto' is tesserocr if it is installed
+
+    Unlike create_backend('auto'), a converter using the resolved name does not fall back to
+    pytesseract later, so everything keyed by the backend stays consistent.
+    """
+    if name == 'auto':
+        return 'tesserocr' if importlib.util.find_spec('tesserocr') else 'pytesseract'
+    return name
+
+def default_backend_name() -> str:
+    """OCR backend selected by PDF_OCR_BACKEND (default: auto)"""
+    return os.environ.get('PDF_OCR_BACKEND', 'auto')
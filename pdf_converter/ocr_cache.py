@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk OCR cache
+Maps a hash of the rendered page pixels plus the OCR/preprocessing settings to the extracted text
+"""
+
+from __future__ import annotations
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'ocr_cache'
+DEFAULT_MAX_MB = 512
+# Stored instead of the text when a page was rejected for low OCR confidence,
+# followed by the confidence; Tesseract never returns NUL characters
+LOW_CONFIDENCE = '\x00low-confidence:'
+
+class OCRCache:
+    """Stores OCR text per page hash with a size cap and LRU eviction (by file mtime)"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, directory: Optional[str] = None) -> Optional['OCRCache']:
+        """Create the cache from PDF_OCR_CACHE_DIR / PDF_OCR_CACHE_MAX_MB, None if disabled"""
+        if directory is None:
+            directory = os.environ.get('PDF_OCR_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if not directory:
+            return None
+        max_mb = int(os.environ.get('PDF_OCR_CACHE_MAX_MB', str(DEFAULT_MAX_MB)))
+        return cls(directory, max_mb * 1024 * 1024)
+
+    @staticmethod
+    def key(image: Image.Image, settings: str) -> str:
+        """Hash the page pixels together with everything that influences the OCR result"""
+        digest = hashlib.sha256()
+        digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:{settings}\n".encode('utf-8'))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text, or None on a miss"""
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """Store text for key, evicting least recently used entries above the size cap"""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = text.encode('utf-8')
+        # An overwritten entry gives its bytes back
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        # Write atomically so concurrent workers never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for path in self.directory.glob('*/*.txt'):
+            try:
+                yield path, path.stat()
+            except FileNotFoundError:
+                continue
+
+    def _disk_usage(self) -> int:
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries until the cache is below 90% of its cap"""
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+
+        for path, stat in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+            evicted += 1
+
+        self._size = size
+        logger.info(f"OCR cache evicted {evicted} entries ({size} bytes in use)")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Page images embedded in the EPUB
+Encoded independently of the image used for OCR: own resolution and format
+"""
+
+from __future__ import annotations
+
+import os
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# format -> (file extension, media type)
+FORMATS = {
+    'png': ('png', 'image/png'),
+    'png-gray': ('png', 'image/png'),
+    'jpeg': ('jpg', 'image/jpeg'),
+    'webp': ('webp', 'image/webp'),
+}
+
+class EpubImageSettings:
+    """Target size and encoding of the page images in the EPUB
+
+    dpi scales the rendered page relative to the OCR resolution, width sets a
+    fixed pixel width instead; pages are never upscaled.
+    """
+
+    def __init__(self, image_format: str = 'jpeg', dpi: Optional[int] = 150,
+                 width: Optional[int] = None, quality: int = 80, gray_levels: int = 16):
+        if image_format not in FORMATS:
+            raise ValueError(f"Unknown EPUB image format: {image_format}")
+        self.format = image_format
+        self.dpi = dpi
+        self.width = width
+        self.quality = quality
+        self.gray_levels = gray_levels
+
+    @classmethod
+    def from_env(cls) -> 'EpubImageSettings':
+        """Settings from PDF_EPUB_IMAGE_FORMAT/_DPI/_WIDTH/_QUALITY"""
+        dpi = os.environ.get('PDF_EPUB_IMAGE_DPI', '150')
+        width = os.environ.get('PDF_EPUB_IMAGE_WIDTH')
+        return cls(
+            image_format=os.environ.get('PDF_EPUB_IMAGE_FORMAT', 'jpeg'),
+            dpi=int(dpi) if dpi else None,
+            width=int(width) if width else None,
+            quality=int(os.environ.get('PDF_EPUB_IMAGE_QUALITY', '80')),
+        )
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.format][0]
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.format][1]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'image_format': self.format,
+            'dpi': self.dpi,
+            'width': self.width,
+            'quality': self.quality,
+            'gray_levels': self.gray_levels,
+        }
+
+    def target_size(self, size: Tuple[int, int], source_dpi: int) -> Tuple[int, int]:
+        width, height = size
+        if self.width:
+            scale = self.width / width
+        elif self.dpi:
+            scale = self.dpi / source_dpi
+        else:
+            scale = 1.0
+        scale = min(scale, 1.0)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _raw_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+def encode_page_image(image: Image.Image, settings: EpubImageSettings,
+                      source_dpi: int) -> Tuple[bytes, Dict[str, int]]:
+    """Resize and encode a rendered page for the EPUB, returning (data, byte counts)
+
+    The byte counts compare the uncompressed render, the uncompressed resized
+    image and the encoded file, so a job can report what each setting saves.
+    """
+    from PIL import Image
+
+    sizes = {'raw': _raw_bytes(image)}
+
+    target_size = settings.target_size(image.size, source_dpi)
+    if target_size != image.size:
+        image = image.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    if settings.format == 'png-gray':
+        image = image.convert('L')
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    sizes['resized'] = _raw_bytes(image)
+
+    buffer = BytesIO()
+    if settings.format == 'png':
+        image.save(buffer, format='PNG')
+    elif settings.format == 'png-gray':
+        # Quantise to a few gray levels so the PNG can use a small palette
+        levels = max(2, min(settings.gray_levels, 256))
+        bits = next(bits for bits in (1, 2, 4, 8) if levels <= 2 ** bits)
+        image.quantize(colors=levels).save(buffer, format='PNG', optimize=True, bits=bits)
+    elif settings.format == 'jpeg':
+        image.save(buffer, format='JPEG', quality=settings.quality, optimize=True, progressive=True)
+    elif settings.format == 'webp':
+        image.save(buffer, format='WEBP', quality=settings.quality, method=4)
+
+    data = buffer.getvalue()
+    sizes['encoded'] = len(data)
+    return data, sizes
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Image preprocessing for OCR
+A configurable grayscale pipeline that reuses preallocated buffers across pages
+"""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+# Stages in the order they are applied
+STAGES = ('blur', 'threshold', 'close')
+
+class PreprocessPipeline:
+    """Grayscale -> Gaussian blur -> adaptive threshold -> morphological close
+
+    The returned array is one of the pipeline's own buffers: it stays valid until
+    the next call to run(), so callers must finish OCR on it before the next page.
+    """
+
+    def __init__(self, stages: Optional[Iterable[str]] = None, blur_kernel: int = 5,
+                 threshold_block_size: int = 11, threshold_c: int = 2, close_kernel: int = 2):
+        stages = tuple(STAGES if stages is None else stages)
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing stages: {', '.join(sorted(unknown))}")
+        # Keep the canonical order regardless of how the stages were listed
+        self.stages = tuple(stage for stage in STAGES if stage in stages)
+
+        self.blur_kernel = blur_kernel
+        self.threshold_block_size = threshold_block_size
+        self.threshold_c = threshold_c
+        self.close_kernel_size = close_kernel
+        # NumPy and OpenCV are imported on the first page, not when the converter is created
+        self._close_kernel: Optional[np.ndarray] = None
+
+        # Per-stage seconds of the last run
+        self.timings: Dict[str, float] = {}
+        # Grayscale page of the last run, before blur and threshold
+        self.grayscale: Optional[np.ndarray] = None
+
+        self._shape: Optional[Tuple[int, int]] = None
+        self._buffers: Tuple[np.ndarray, np.ndarray] = ()
+
+    @classmethod
+    def from_stage_list(cls, stages: Optional[str]) -> 'PreprocessPipeline':
+        """Create a pipeline from a comma separated stage list such as 'blur,threshold'"""
+        if stages is None:
+            return cls()
+        return cls([stage.strip() for stage in stages.split(',') if stage.strip()])
+
+    def signature(self) -> str:
+        """Parameters that change the output, used as part of the OCR cache key"""
+        return (f"stages={'+'.join(self.stages)},blur_kernel={self.blur_kernel},"
+                f"threshold_block_size={self.threshold_block_size},threshold_c={self.threshold_c},"
+                f"close_kernel={self.close_kernel_size}")
+
+    def _buffers_for(self, shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Reuse the two ping-pong buffers as long as the page size does not change"""
+        import numpy as np
+        if shape != self._shape:
+            self._buffers = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+            self._shape = shape
+        return self._buffers
+
+    def run(self, image: Image.Image) -> np.ndarray:
+        """Preprocess a page and return the binarised grayscale array"""
+        import cv2
+        import numpy as np
+
+        timings = {}
+
+        started = time.perf_counter()
+        # Start from grayscale: PIL converts RGB to L in one pass, without a BGR copy
+        if image.mode != 'L':
+            image = image.convert('L')
+        current = self.grayscale = np.asarray(image)
+        timings['grayscale'] = time.perf_counter() - started
+
+        buffers = self._buffers_for(current.shape)
+        target = 0
+
+        if 'blur' in self.stages:
+            started = time.perf_counter()
+            # Reduce noise
+            current = cv2.GaussianBlur(current, (self.blur_kernel, self.blur_kernel), 0, dst=buffers[target])
+            target ^= 1
+            timings['blur'] = time.perf_counter() - started
+
+        if 'threshold' in self.stages:
+            started = time.perf_counter()
+            current = cv2.adaptiveThreshold(
+                current, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                self.threshold_block_size, self.threshold_c, dst=buffers[target]
+            )
+            target ^= 1
+            timings['threshold'] = time.perf_counter() - started
+
+        if 'close' in self.stages:
+            started = time.perf_counter()
+            # Morphological close to clean up
+            if self._close_kernel is None:
+                self._close_kernel = np.ones((self.close_kernel_size, self.close_kernel_size), np.uint8)
+            current = cv2.morphologyEx(current, cv2.MORPH_CLOSE, self._close_kernel, dst=buffers[target])
+            timings['close'] = time.perf_counter() - started
+
+        self.timings = timings
+        return current
@@ -16,7 +16,6 @@ def install_python_packages():
         'Pillow==10.1.0',
         'pytesseract==0.3.10',
         'ebooklib==0.18',
-        'beautifulsoup4==4.12.2',
         'lxml==4.9.3',
         'arabic-reshaper==3.0.0',
         'python-bidi==0.4.2',
@@ -34,6 +33,13 @@ def install_python_packages():
             print(f"✓ Installed {package}")
         except subprocess.CalledProcessError as e:
             print(f"✗ Failed to install {package}: {e}")
+    
+    # Optional: in-process Tesseract engine, needs libtesseract-dev to build
+    try:
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'tesserocr==2.6.2'])
+        print("✓ Installed tesserocr==2.6.2")
+    except subprocess.CalledProcessError:
+        print("- tesserocr not installed, OCR will use pytesseract")
 
 def install_system_dependencies():
     """Install system dependencies (Linux/Ubuntu)"""
@@ -43,6 +49,8 @@ def install_system_dependencies():
         'tesseract-ocr-ara',
         'tesseract-ocr-eng', 
         'tesseract-ocr-deu',
+        'libtesseract-dev',
+        'libleptonica-dev',
         'libgl1-mesa-glx',
         'libglib2.0-0'
     ]
@@ -38,6 +38,20 @@ def test_service():
         print(f"✗ Error testing conversion endpoint: {e}")
         return False
     
+    # Test job status endpoint with an unknown job id
+    try:
+        print("\nTesting job status endpoint...")
+        response = requests.get('http://localhost:5001/jobs/does-not-exist')
+        
+        if response.status_code == 404:
+            print("✓ Job status endpoint is responding (expected 404 for unknown job)")
+        else:
+            print(f"? Unexpected response: {response.status_code}")
+            
+    except Exception as e:
+        print(f"✗ Error testing job status endpoint: {e}")
+        return False
+    
     print("\n✓ All tests passed! Service is ready for PDF conversion.")
     return True
 
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the page layout pre-pass
+Run with pytest or directly: python test_text_regions.py
+"""
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import PreprocessPipeline
+from text_regions import TextRegionDetector, reading_order
+
+def blank_page(width: int = 2480, height: int = 3508) -> np.ndarray:
+    """White binarised page at 300 dpi"""
+    return np.full((height, width), 255, dtype=np.uint8)
+
+def draw_text_block(page: np.ndarray, x0: int, y0: int, x1: int, y1: int) -> None:
+    """Lines of dark strokes, roughly the ink pattern of a paragraph"""
+    for y in range(y0, y1, 40):
+        for x in range(x0, x1, 30):
+            page[y:y + 12, x:x + 20] = 0
+
+def test_reading_order_side_by_side():
+    """Blocks whose tops differ by a few pixels are one band, read right to left"""
+    left, right = (132, 948, 972, 1596), (1428, 964, 2268, 1612)
+    assert reading_order([left, right]) == [right, left]
+
+def test_reading_order_bands():
+    """A heading above two columns comes first, a footer below them last"""
+    heading, footer = (100, 50, 2200, 200), (100, 1700, 2200, 1800)
+    left, right = (132, 948, 972, 1596), (1428, 964, 2268, 1612)
+    assert reading_order([footer, left, heading, right]) == [heading, right, left, footer]
+
+def test_detect_side_by_side_columns():
+    page = blank_page()
+    draw_text_block(page, 150, 990, 950, 1580)
+    draw_text_block(page, 1450, 1000, 2250, 1600)
+    layout = TextRegionDetector().detect(page)
+    assert len(layout.regions) == 2
+    # The right column is read first
+    assert layout.regions[0][0] > layout.regions[1][2]
+
+def test_detect_rejects_filled_block():
+    """A filled area is only an outline after the adaptive threshold, but still not text"""
+    page = blank_page()
+    draw_text_block(page, 200, 300, 2280, 900)
+    page[1200:2400, 600:1900] = 40
+    pipeline = PreprocessPipeline()
+    binary = pipeline.run(Image.fromarray(page))
+    layout = TextRegionDetector().detect(binary, pipeline.grayscale)
+    assert len(layout.regions) == 1
+    x0, y0, x1, y1 = layout.regions[0]
+    assert y1 < 1200
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Page layout pre-pass for OCR
+Measures ink density on the binarised page and finds text-block bounding boxes with NumPy,
+so blank pages skip OCR and only the text regions are sent to the engine
+"""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# (x0, y0, x1, y1) in pixels, end exclusive
+Region = Tuple[int, int, int, int]
+
+def reading_order(regions: List[Region]) -> List[Region]:
+    """Arabic reading order: bands of vertically overlapping regions from top to bottom,
+    right to left within a band, so blocks whose tops differ by a few pixels stay side by side
+    """
+    ordered: List[Region] = []
+    band: List[Region] = []
+    band_bottom = 0
+    for region in sorted(regions, key=lambda r: r[1]):
+        if band and region[1] >= band_bottom:
+            ordered.extend(sorted(band, key=lambda r: -r[2]))
+            band = []
+        if not band:
+            band_bottom = region[3]
+        band.append(region)
+        band_bottom = max(band_bottom, region[3])
+    ordered.extend(sorted(band, key=lambda r: -r[2]))
+    return ordered
+
+class PageLayout:
+    """Result of the pre-pass: ink ratio of the page and the regions worth OCR-ing"""
+
+    def __init__(self, shape: Tuple[int, int], ink_ratio: float, regions: List[Region]):
+        self.height, self.width = shape[:2]
+        self.ink_ratio = ink_ratio
+        self.regions = regions
+
+    @property
+    def blank(self) -> bool:
+        return not self.regions
+
+    @property
+    def pixels(self) -> int:
+        return self.height * self.width
+
+    @property
+    def ocr_pixels(self) -> int:
+        return sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in self.regions)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'ink_ratio': round(self.ink_ratio, 5),
+            'regions': len(self.regions),
+            'blank': self.blank,
+            'pixels': self.pixels,
+            'ocr_pixels': self.ocr_pixels,
+        }
+
+class TextRegionDetector:
+    """Blank-page check and text-block detection on a coarse grid of ink cells
+
+    The page is split into cell x cell blocks; blocks with enough ink pixels are dilated
+    so words and lines merge into blocks, and the connected blocks become the regions.
+    Specks (few ink cells) and solid areas (pictures, black borders) are dropped.
+    """
+
+    def __init__(self, enabled: bool = True, cell: int = 16, blank_ink_ratio: float = 0.002,
+                 cell_ink_ratio: float = 0.02, max_region_ink_ratio: float = 0.6,
+                 min_region_cells: int = 6, merge: Tuple[int, int] = (3, 1), padding: int = 12,
+                 max_regions: int = 6, min_saving: float = 0.1):
+        self.enabled = enabled
+        self.cell = cell
+        self.blank_ink_ratio = blank_ink_ratio
+        self.cell_ink_ratio = cell_ink_ratio
+        self.max_region_ink_ratio = max_region_ink_ratio
+        self.min_region_cells = min_region_cells
+        # Dilation radius in cells (x, y): words on a line and neighbouring lines merge
+        self.merge = merge
+        # NumPy and OpenCV are imported on the first page, not when the converter is created
+        self._merge_kernel: Optional[np.ndarray] = None
+        self.padding = padding
+        # More regions than this are OCR'd as their common bounding box
+        self.max_regions = max_regions
+        # Crop only if it saves at least this fraction of the page
+        self.min_saving = min_saving
+
+    @classmethod
+    def from_env(cls, enabled: Optional[bool] = None) -> 'TextRegionDetector':
+        """Detector switched by PDF_TEXT_REGIONS (default: on, "0" sends whole pages to OCR)"""
+        if enabled is None:
+            enabled = os.environ.get('PDF_TEXT_REGIONS', '1') != '0'
+        return cls(enabled=enabled)
+
+    def signature(self) -> str:
+        """Parameters that change the OCR output, used as part of the OCR cache key"""
+        if not self.enabled:
+            return 'regions=off'
+        return (f"regions=cell{self.cell},blank{self.blank_ink_ratio},ink{self.cell_ink_ratio},"
+                f"max{self.max_region_ink_ratio}otsu,min{self.min_region_cells},"
+                f"merge{2 * self.merge[0] + 1}x{2 * self.merge[1] + 1},pad{self.padding},"
+                f"n{self.max_regions},save{self.min_saving}")
+
+    def detect(self, binary: np.ndarray, grayscale: Optional[np.ndarray] = None) -> PageLayout:
+        """Layout of a preprocessed page (dark text on a light background)
+
+        The adaptive threshold turns filled areas into outlines, so the ink density that
+        drops pictures is measured on the Otsu-binarised grayscale page when it is given.
+        """
+        import cv2
+        import numpy as np
+
+        height, width = binary.shape[:2]
+        whole_page = [(0, 0, width, height)]
+        if not self.enabled:
+            return PageLayout(binary.shape, 0.0, whole_page)
+
+        ink = binary < 128
+        ink_ratio = float(np.count_nonzero(ink)) / ink.size if ink.size else 0.0
+        if ink_ratio < self.blank_ink_ratio:
+            return PageLayout(binary.shape, ink_ratio, [])
+
+        # Ink pixels per cell; the remainder along the right/bottom edge is margin
+        cell = self.cell
+        rows, cols = height // cell, width // cell
+        if rows == 0 or cols == 0:
+            return PageLayout(binary.shape, ink_ratio, whole_page)
+        counts = ink[:rows * cell, :cols * cell].reshape(rows, cell, cols, cell).sum(axis=(1, 3), dtype=np.int32)
+        cells = (counts >= self.cell_ink_ratio * cell * cell).astype(np.uint8)
+        if grayscale is not None:
+            _, solid = cv2.threshold(grayscale, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            solid = solid < 128
+            solid_counts = solid[:rows * cell, :cols * cell].reshape(rows, cell, cols, cell).sum(axis=(1, 3), dtype=np.int32)
+        else:
+            solid_counts = counts
+
+        if self._merge_kernel is None:
+            self._merge_kernel = np.ones((2 * self.merge[1] + 1, 2 * self.merge[0] + 1), np.uint8)
+        merged = cv2.dilate(cells, self._merge_kernel)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(merged, connectivity=8)
+
+        regions = []
+        for label in range(1, count):
+            x, y, w, h = (int(v) for v in stats[label, :4])
+            component = labels[y:y + h, x:x + w] == label
+            ink_cells = int(np.count_nonzero(cells[y:y + h, x:x + w] & component))
+            if ink_cells < self.min_region_cells:
+                continue  # speck or stray mark
+            # A picture's component is only its outline, so its bounding box counts as well
+            solid_cells = solid_counts[y:y + h, x:x + w]
+            density = max(float(solid_cells[component].sum()) / int(component.sum()),
+                          float(solid_cells.sum()) / (w * h)) / (cell * cell)
+            if density > self.max_region_ink_ratio:
+                continue  # solid area such as a picture or a scanned border
+            regions.append((
+                max(0, x * cell - self.padding),
+                max(0, y * cell - self.padding),
+                min(width, (x + w) * cell + self.padding),
+                min(height, (y + h) * cell + self.padding),
+            ))
+
+        if not regions:
+            return PageLayout(binary.shape, ink_ratio, [])
+        if len(regions) > self.max_regions:
+            regions = [(min(r[0] for r in regions), min(r[1] for r in regions),
+                        max(r[2] for r in regions), max(r[3] for r in regions))]
+
+        layout = PageLayout(binary.shape, ink_ratio, regions)
+        if layout.ocr_pixels > (1 - self.min_saving) * layout.pixels:
+            # Cropping would barely help, keep Tesseract's view of the whole page
+            return PageLayout(binary.shape, ink_ratio, whole_page)
+
+        layout.regions = reading_order(layout.regions)
+        return layout
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Vocabulary index for interlinear translations
+Translations from vocab.md (and unique_words.txt) keyed by normalised Arabic, loaded once per process
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_VOCAB_PATH = REPO_DIR / 'vocab.md'
+DEFAULT_WORDS_PATH = REPO_DIR / 'unique_words.txt'
+
+# Tashkeel, Quranic marks, superscript alef and tatweel
+DIACRITICS_PATTERN = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+# Anything that is not an Arabic letter after normalisation
+NON_LETTER_PATTERN = re.compile(r'[^\u0621-\u064A\u0671-\u06D3]')
+# Same unification as normalize-arabic.js
+LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+# Clitics and the article, longest first; a stem keeps at least three letters
+PREFIXES = ('وبال', 'وكال', 'وال', 'فال', 'بال', 'كال', 'لل', 'ال', 'و', 'ف', 'ب', 'ك', 'ل')
+MIN_STEM_LENGTH = 3
+# unique_words.txt lines carrying a translation: "word<TAB>translation" or "word - translation"
+WORDS_LINE_PATTERN = re.compile(r'^(\S+)(?:\t+|\s+[-–=:]\s+)(.+)$')
+
+def normalize_arabic(word: str) -> str:
+    """Lookup key of a word: presentation forms resolved, diacritics stripped, letter variants unified"""
+    word = unicodedata.normalize('NFKC', word)
+    word = DIACRITICS_PATTERN.sub('', word).translate(LETTER_MAP)
+    return NON_LETTER_PATTERN.sub('', word)
+
+def strip_prefix(key: str) -> str:
+    """Remove the longest leading clitic/article from a normalised key"""
+    for prefix in PREFIXES:
+        if key.startswith(prefix) and len(key) - len(prefix) >= MIN_STEM_LENGTH:
+            return key[len(prefix):]
+    return key
+
+def parse_vocab_md(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """(arabic, german) pairs from vocab.md: an Arabic line, a German line, a blank line"""
+    block: List[str] = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            block.append(line)
+            continue
+        if len(block) >= 2:
+            yield block[0], ' '.join(block[1:])
+        block = []
+    if len(block) >= 2:
+        yield block[0], ' '.join(block[1:])
+
+def parse_unique_words(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """(arabic, german) pairs from unique_words.txt lines that carry a translation"""
+    for line in lines:
+        match = WORDS_LINE_PATTERN.match(line.strip())
+        if match:
+            yield match.group(1), match.group(2).strip()
+
+class VocabularyIndex:
+    """Hash index from normalised Arabic words (and their prefix-less stems) to German"""
+
+    def __init__(self):
+        self._exact: Dict[str, str] = {}
+        self._stems: Dict[str, str] = {}
+        self.signature = ''
+
+    @classmethod
+    def from_files(cls, vocab_path: Optional[Path] = DEFAULT_VOCAB_PATH,
+                   words_path: Optional[Path] = DEFAULT_WORDS_PATH) -> 'VocabularyIndex':
+        index = cls()
+        digest = hashlib.sha256()
+        for path, parse in ((vocab_path, parse_vocab_md), (words_path, parse_unique_words)):
+            if not path or not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                content = f.read()
+            digest.update(content.encode('utf-8'))
+            index.update(parse(content.splitlines()))
+        index.signature = digest.hexdigest()
+        logger.info(f"Loaded {len(index)} vocabulary entries")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def update(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """Add (arabic, german) pairs; the first translation of a word wins"""
+        for word, translation in entries:
+            key = normalize_arabic(word)
+            if not key or not translation:
+                continue
+            self._exact.setdefault(key, translation)
+            self._stems.setdefault(strip_prefix(key), translation)
+
+    def lookup(self, word: str, visual: bool = False) -> Optional[str]:
+        """German translation of a word, None if unknown
+
+        visual=True takes a word as produced by get_display (reshaped, characters
+        reversed), like the OCR text the converter renders.
+        """
+        if visual:
+            word = word[::-1]
+        key = normalize_arabic(word)
+        translation = None
+        if key:
+            translation = self._exact.get(key)
+            if translation is None:
+                stem = strip_prefix(key)
+                translation = self._exact.get(stem) or self._stems.get(stem)
+        return translation
+
+_indexes: Dict[Tuple[str, str], VocabularyIndex] = {}
+_indexes_lock = threading.Lock()
+
+def load_vocabulary(vocab_path: Optional[str] = None, words_path: Optional[str] = None) -> Optional[VocabularyIndex]:
+    """Shared index for this process, from PDF_VOCAB_PATH / PDF_VOCAB_WORDS_PATH by default
+
+    An empty PDF_VOCAB_PATH disables prefilled translations (returns None).
+    """
+    if vocab_path is None:
+        vocab_path = os.environ.get('PDF_VOCAB_PATH', str(DEFAULT_VOCAB_PATH))
+    if words_path is None:
+        words_path = os.environ.get('PDF_VOCAB_WORDS_PATH', str(DEFAULT_WORDS_PATH))
+    if not vocab_path:
+        return None
+
+    key = (vocab_path, words_path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = VocabularyIndex.from_files(Path(vocab_path), Path(words_path) if words_path else None)
+        return _indexes[key]
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point
+gunicorn --config gunicorn.conf.py wsgi:app
+"""
+
+from main import create_app
+
+app = create_app()
@@ -2,51 +2,132 @@
 """
 Verarbeitet die PDF "Al-Qir'atur.Rashida (1-2).pdf" von Seite 30-180
 und erstellt strukturierte arabische Inhalte für den BookReader.
+
+Die Textebene der PDF wird parallel in mehreren Prozessen gelesen. Nur Seiten ohne
+brauchbaren arabischen Text gehen an die Tesseract-OCR des PDF-Konverters; für jede
+Seite wird festgehalten, womit ihr Text gewonnen wurde.
 """
 
 import PyPDF2
 import json
 import re
 import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from book_store import BookWriter
+
+# Methoden, mit denen der Text einer Seite gewonnen wurde
+TEXT_LAYER = 'text_layer'
+OCR = 'ocr'
+
+def page_chunks(page_numbers, chunks):
+    """Teilt aufsteigende Seitenzahlen in höchstens `chunks` zusammenhängende Blöcke"""
+    size = max(1, -(-len(page_numbers) // max(1, chunks)))
+    return [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+
+def read_text_layer(pdf_path, page_numbers):
+    """Textebene einiger Seiten (1-basiert) lesen, ein PdfReader pro Block; läuft im Worker-Prozess"""
+    results = []
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_num in page_numbers:
+            try:
+                text = pdf_reader.pages[page_num - 1].extract_text()
+                results.append((page_num, clean_arabic_text(text), None))
+            except Exception as e:
+                results.append((page_num, "", str(e)))
+    return results
+
+# OCR-Konverter je Worker-Prozess, wird beim ersten Block angelegt
+_ocr_converter = None
 
-def extract_pdf_pages(pdf_path, start_page=30, end_page=180):
-    """Extrahiert Text von spezifischen Seiten der PDF"""
+def ocr_pages(pdf_path, page_numbers, dpi):
+    """Seiten ohne brauchbare Textebene mit Tesseract lesen (Weg wie im PDFToEpubConverter)"""
+    global _ocr_converter
+    if _ocr_converter is None:
+        sys.path.insert(0, str(Path(__file__).resolve().parent / "pdf_converter"))
+        from main import PDFToEpubConverter
+        _ocr_converter = PDFToEpubConverter(dpi=dpi, workers=1, adaptive_dpi=0)
+    
+    results = []
+    try:
+        for page_num, image in _ocr_converter.iter_page_images(pdf_path, page_numbers=page_numbers):
+            try:
+                # Logische Reihenfolge wie in der Textebene, nicht die Anzeigeform aus get_display
+                text = _ocr_converter.recognize_text(image)
+                results.append((page_num, clean_arabic_text(text), None))
+            except Exception as e:
+                results.append((page_num, "", str(e)))
+            finally:
+                image.close()
+    except Exception as e:
+        # Rendern fehlgeschlagen (z.B. kein poppler): alle noch offenen Seiten als Fehler melden
+        done = {page_num for page_num, _, _ in results}
+        results.extend((page_num, "", str(e)) for page_num in page_numbers if page_num not in done)
+    return results
+
+def extract_pdf_pages(pdf_path, start_page=30, end_page=180, workers=None, ocr=True, dpi=300):
+    """Extrahiert Text von spezifischen Seiten der PDF
+    
+    Jede Seite im Ergebnis enthält 'method': 'text_layer' oder 'ocr'.
+    """
     try:
         with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
-            
-            print(f"PDF hat {total_pages} Seiten insgesamt")
-            print(f"Extrahiere Seiten {start_page} bis {min(end_page, total_pages)}")
-            
-            extracted_content = []
-            
-            for page_num in range(start_page - 1, min(end_page, total_pages)):  # -1 weil 0-indexiert
-                try:
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    
-                    if text and text.strip():
-                        # Bereinige den Text
-                        cleaned_text = clean_arabic_text(text)
-                        if cleaned_text:
-                            extracted_content.append({
-                                'page_number': page_num + 1,
-                                'content': cleaned_text
-                            })
-                            print(f"Seite {page_num + 1}: {len(cleaned_text)} Zeichen extrahiert")
-                    else:
-                        print(f"Seite {page_num + 1}: Leer oder nicht lesbar")
-                        
-                except Exception as e:
-                    print(f"Fehler beim Verarbeiten von Seite {page_num + 1}: {e}")
-                    continue
-                    
-            return extracted_content
-            
+            total_pages = len(PyPDF2.PdfReader(file).pages)
     except Exception as e:
         print(f"Fehler beim Öffnen der PDF: {e}")
         return []
+    
+    last_page = min(end_page, total_pages)
+    page_numbers = list(range(start_page, last_page + 1))
+    workers = max(1, workers or os.cpu_count() or 1)
+    print(f"PDF hat {total_pages} Seiten insgesamt")
+    print(f"Extrahiere Seiten {start_page} bis {last_page} mit {workers} Prozessen")
+    
+    pages = {}
+    missing = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 1. Textebene parallel lesen
+        futures = [pool.submit(read_text_layer, pdf_path, chunk) for chunk in page_chunks(page_numbers, workers)]
+        for future in futures:
+            for page_num, text, error in future.result():
+                if text:
+                    pages[page_num] = {'page_number': page_num, 'content': text, 'method': TEXT_LAYER}
+                    print(f"Seite {page_num}: {len(text)} Zeichen aus der Textebene")
+                else:
+                    missing.append(page_num)
+                    if error:
+                        print(f"Fehler beim Verarbeiten von Seite {page_num}: {error}")
+        
+        # 2. Nur die übrigen Seiten per OCR lesen
+        if missing and ocr:
+            print(f"{len(missing)} Seiten ohne brauchbare Textebene, starte OCR...")
+            futures = [pool.submit(ocr_pages, pdf_path, chunk, dpi) for chunk in page_chunks(missing, workers)]
+            for future in futures:
+                for page_num, text, error in future.result():
+                    if text:
+                        pages[page_num] = {'page_number': page_num, 'content': text, 'method': OCR}
+                        print(f"Seite {page_num}: {len(text)} Zeichen per OCR")
+                    elif error:
+                        print(f"OCR-Fehler auf Seite {page_num}: {error}")
+                    else:
+                        print(f"Seite {page_num}: Leer oder nicht lesbar")
+        elif missing:
+            print(f"{len(missing)} Seiten ohne brauchbare Textebene (OCR deaktiviert)")
+    
+    return [pages[page_num] for page_num in sorted(pages)]
+
+def method_summary(extracted_pages, start_page, end_page):
+    """Welche Seiten aus der Textebene, welche per OCR und welche gar nicht gelesen wurden"""
+    methods = {TEXT_LAYER: [], OCR: []}
+    for page_data in extracted_pages:
+        methods[page_data['method']].append(page_data['page_number'])
+    found = {page_data['page_number'] for page_data in extracted_pages}
+    methods['missing'] = [page_num for page_num in range(start_page, end_page + 1) if page_num not in found]
+    return methods
 
 def clean_arabic_text(text):
     """Bereinigt und formatiert arabischen Text"""
@@ -68,48 +149,62 @@ def clean_arabic_text(text):
     
     return text.strip()
 
-def create_book_content(extracted_pages):
-    """Erstellt den BookReader-kompatiblen Inhalt"""
-    if not extracted_pages:
-        return ""
-    
-    content_parts = []
-    content_parts.append('<h1>القراءة الراشدة - الجزء الأول والثاني</h1>')
-    content_parts.append('<p>محتوى أصلي من PDF الصفحات 30-180</p>')
-    
+def iter_lessons(extracted_pages):
+    """Fasst Seiten zu Lektionen zusammen: (Titel, Seiten, letzte Lektion?) je Lektion"""
     lesson_count = 0
-    current_lesson_content = []
+    current_lesson_pages = []
     
     for page_data in extracted_pages:
-        page_content = page_data['content']
-        page_num = page_data['page_number']
-        
         # Sammle Inhalt für Lektionen (alle 3-5 Seiten eine neue Lektion)
-        current_lesson_content.append(page_content)
+        current_lesson_pages.append(page_data)
         
         # Erstelle eine neue Lektion alle 4 Seiten oder bei wichtigen Überschriften
-        if len(current_lesson_content) >= 4 or has_lesson_marker(page_content):
+        if len(current_lesson_pages) >= 4 or has_lesson_marker(page_data['content']):
             lesson_count += 1
             
             # Bestimme Lektionstitel basierend auf Inhalt
-            lesson_title = extract_lesson_title(current_lesson_content) or f"الدرس {lesson_count}"
-            
-            content_parts.append(f'<h2>{lesson_title}</h2>')
-            
-            # Kombiniere den Lektionsinhalt
-            combined_content = ' '.join(current_lesson_content)
-            content_parts.append(f'<p>{combined_content}</p><!-- pagebreak -->')
+            lesson_content = [page['content'] for page in current_lesson_pages]
+            lesson_title = extract_lesson_title(lesson_content) or f"الدرس {lesson_count}"
             
             print(f"Lektion {lesson_count} erstellt: {lesson_title}")
-            current_lesson_content = []
+            yield lesson_title, current_lesson_pages, False
+            current_lesson_pages = []
     
     # Füge verbleibenden Inhalt hinzu
-    if current_lesson_content:
-        lesson_count += 1
-        lesson_title = f"الدرس الأخير"
-        content_parts.append(f'<h2>{lesson_title}</h2>')
-        combined_content = ' '.join(current_lesson_content)
-        content_parts.append(f'<p>{combined_content}</p>')
+    if current_lesson_pages:
+        yield "الدرس الأخير", current_lesson_pages, True
+
+def lesson_html(lesson_title, lesson_pages, last):
+    # Kombiniere den Lektionsinhalt
+    combined_content = ' '.join(page['content'] for page in lesson_pages)
+    pagebreak = '' if last else '<!-- pagebreak -->'
+    return f'<h2>{lesson_title}</h2>\n      <p>{combined_content}</p>{pagebreak}'
+
+def create_book_content(extracted_pages, writer=None):
+    """Erstellt den BookReader-kompatiblen Inhalt
+    
+    Ohne writer als ein HTML-String (JSON-Format). Mit einem book_store.BookWriter
+    werden Seiten und Lektionen direkt nacheinander ins .book geschrieben; Rückgabe ist dann
+    die Anzahl der Lektionen.
+    """
+    if writer is not None:
+        lesson_count = 0
+        for lesson_title, lesson_pages, last in iter_lessons(extracted_pages):
+            for page_data in lesson_pages:
+                writer.add_page(page_data['page_number'], page_data['content'], method=page_data['method'])
+            writer.add_lesson(lesson_title, lesson_pages[0]['page_number'], lesson_pages[-1]['page_number'],
+                              lesson_html(lesson_title, lesson_pages, last))
+            lesson_count += 1
+        return lesson_count
+    
+    if not extracted_pages:
+        return ""
+    
+    content_parts = []
+    content_parts.append('<h1>القراءة الراشدة - الجزء الأول والثاني</h1>')
+    content_parts.append('<p>محتوى أصلي من PDF الصفحات 30-180</p>')
+    for lesson in iter_lessons(extracted_pages):
+        content_parts.append(lesson_html(*lesson))
     
     return '\n      '.join(content_parts)
 
@@ -138,39 +233,61 @@ def extract_lesson_title(content_list):
     
     return None
 
-def main():
-    pdf_path = "Al-Qir`atur.Rashida (1-2).pdf"
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default="Al-Qir`atur.Rashida (1-2).pdf")
+    parser.add_argument("--start", type=int, default=30)
+    parser.add_argument("--end", type=int, default=180)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Prozesse für Textebene und OCR")
+    parser.add_argument("--dpi", type=int, default=300, help="Auflösung für die OCR")
+    parser.add_argument("--no-ocr", action="store_true", help="Seiten ohne Textebene nicht per OCR lesen")
+    parser.add_argument("--output", default="qiraatu-rashida-pages-30-180.json",
+                        help=".json (Standard, vom BookReader gelesen) oder .book (indiziert, book_store.py)")
+    args = parser.parse_args(argv)
+    pdf_path = args.pdf
     
     if not os.path.exists(pdf_path):
         print(f"PDF-Datei nicht gefunden: {pdf_path}")
-        return
+        return 1
     
-    print("Beginne PDF-Verarbeitung von Seite 30-180...")
-    extracted_pages = extract_pdf_pages(pdf_path, 30, 180)
+    print(f"Beginne PDF-Verarbeitung von Seite {args.start}-{args.end}...")
+    extracted_pages = extract_pdf_pages(pdf_path, args.start, args.end, args.workers, not args.no_ocr, args.dpi)
     
     if not extracted_pages:
         print("Keine Inhalte extrahiert!")
-        return
-    
-    print(f"\n{len(extracted_pages)} Seiten erfolgreich extrahiert")
+        return 1
     
-    # Erstelle BookReader-Inhalt
-    book_content = create_book_content(extracted_pages)
+    methods = method_summary(extracted_pages, args.start, extracted_pages[-1]['page_number'])
+    print(f"\n{len(extracted_pages)} Seiten erfolgreich extrahiert "
+          f"({len(methods[TEXT_LAYER])} Textebene, {len(methods[OCR])} OCR, {len(methods['missing'])} fehlen)")
     
-    # Speichere Ergebnis
-    result = {
-        'title': 'القراءة الراشدة - الصفحات 30-180',
-        'pages_extracted': len(extracted_pages),
-        'content': book_content,
-        'source_pages': f"30-{extracted_pages[-1]['page_number'] if extracted_pages else 180}"
-    }
+    title = f'القراءة الراشدة - الصفحات {args.start}-{args.end}'
+    source_pages = f"{args.start}-{extracted_pages[-1]['page_number']}"
     
-    with open('qiraatu-rashida-pages-30-180.json', 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    if not args.output.endswith('.book'):
+        # Standardformat: ein JSON mit dem ganzen Buch als HTML-String
+        book_content = create_book_content(extracted_pages)
+        result = {
+            'title': title,
+            'pages_extracted': len(extracted_pages),
+            'content': book_content,
+            'source_pages': source_pages,
+            'extraction_methods': methods,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        summary = f"Inhaltslänge: {len(book_content)} Zeichen"
+    else:
+        # Indiziertes Format (auf Wunsch): Seiten und Lektionen einzeln abrufbar (book_store.py)
+        meta = {'title': title, 'source_pages': source_pages, 'extraction_methods': methods}
+        with BookWriter(args.output, meta) as writer:
+            lessons = create_book_content(extracted_pages, writer)
+        summary = f"{len(extracted_pages)} Seiten, {lessons} Lektionen, {os.path.getsize(args.output)} Bytes"
     
-    print(f"\nInhalt gespeichert in: qiraatu-rashida-pages-30-180.json")
-    print(f"Quelle: Seiten {result['source_pages']}")
-    print(f"Inhaltslänge: {len(book_content)} Zeichen")
+    print(f"\nInhalt gespeichert in: {args.output}")
+    print(f"Quelle: Seiten {source_pages}")
+    print(summary)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
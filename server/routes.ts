@@ -1,5 +1,6 @@
 import type { Express, Request, Response } from "express";
 import { createServer, type Server } from "http";
+import { Readable } from "stream";
 import { storage } from "./storage";
 import { PushNotificationService } from "./pushNotifications";
 import { insertUserSchema, loginUserSchema } from "@shared/schema";
@@ -365,19 +366,36 @@ export async function registerRoutes(app: Express): Promise<Server> {
       });
 
       if (!response.ok) {
+        // Pass rejections through with their status: invalid ranges (400), busy server
+        // (429/503) with Retry-After, so the client can tell the user when to try again
         const errorText = await response.text();
-        throw new Error(`PDF conversion service error: ${response.status} - ${errorText}`);
+        const retryAfter = response.headers.get('retry-after');
+        if (retryAfter) {
+          res.set('Retry-After', retryAfter);
+        }
+        try {
+          return res.status(response.status).json(JSON.parse(errorText));
+        } catch {
+          return res.status(response.status).json({
+            error: `PDF conversion service error: ${response.status} - ${errorText}`
+          });
+        }
       }
 
       const result = await response.json();
       
-      // Update download URL to use our proxy
+      // Conversions run as background jobs; poll them through our proxy
+      if (result.job_id) {
+        result.status_url = `/api/pdf-jobs/${result.job_id}`;
+      }
+      
+      // Already converted: the EPUB can be downloaded right away
       if (result.download_url) {
         const filename = result.download_url.split('/').pop();
         result.download_url = `/api/pdf-download/${filename}`;
       }
       
-      res.json(result);
+      res.status(response.status).json(result);
     } catch (error) {
       console.error("PDF conversion error:", error);
       res.status(500).json({ 
@@ -387,21 +405,60 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // PDF conversion job status proxy
+  app.get("/api/pdf-jobs/:jobId", async (req: Request, res: Response) => {
+    try {
+      const { jobId } = req.params;
+      const response = await fetch(`http://localhost:5001/jobs/${encodeURIComponent(jobId)}`);
+      const result = await response.json();
+      
+      // Update download URL to use our proxy
+      if (result.download_url) {
+        const filename = result.download_url.split('/').pop();
+        result.download_url = `/api/pdf-download/${filename}`;
+      }
+      
+      res.status(response.status).json(result);
+    } catch (error) {
+      console.error("PDF job status error:", error);
+      res.status(500).json({ error: "Job status failed" });
+    }
+  });
+
   // Download EPUB file proxy
   app.get("/api/pdf-download/:filename", async (req: Request, res: Response) => {
     try {
       const { filename } = req.params;
-      const response = await fetch(`http://localhost:5001/download/${filename}`);
+      // Pass range and conditional headers through, so resumed and repeated downloads stay cheap
+      const forwardHeaders: Record<string, string> = {};
+      for (const name of ['range', 'if-range', 'if-none-match', 'if-modified-since']) {
+        const value = req.headers[name];
+        if (typeof value === 'string') {
+          forwardHeaders[name] = value;
+        }
+      }
+      const response = await fetch(`http://localhost:5001/download/${encodeURIComponent(filename)}`, {
+        headers: forwardHeaders
+      });
       
-      if (!response.ok) {
+      if (!response.ok && response.status !== 304) {
         throw new Error(`Download service error: ${response.status}`);
       }
 
-      // Forward the file
-      const buffer = await response.arrayBuffer();
+      // Stream the file instead of buffering it
+      res.status(response.status);
+      for (const name of ['content-length', 'content-range', 'accept-ranges', 'etag', 'last-modified', 'cache-control']) {
+        const value = response.headers.get(name);
+        if (value) {
+          res.setHeader(name, value);
+        }
+      }
+      if (response.status === 304 || !response.body) {
+        return res.end();
+      }
       res.setHeader('Content-Type', 'application/epub+zip');
       res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
-      res.send(Buffer.from(buffer));
+      Readable.fromWeb(response.body as any).pipe(res);
     } catch (error) {
       console.error("Download error:", error);
       res.status(500).json({ error: "Download failed" });
@@ -19,9 +19,9 @@ if [ ! -f ".installed" ]; then
     touch .installed
 fi
 
-# Start the Flask service
-echo "Starting Flask service on port 5001..."
-python3 main.py &
+# Start the service with gunicorn (several workers, see gunicorn.conf.py)
+echo "Starting gunicorn on port 5001..."
+python3 -m gunicorn --config gunicorn.conf.py wsgi:app &
 
 # Store process ID
 echo $! > pdf_service.pid
@@ -29,5 +29,6 @@ echo $! > pdf_service.pid
 echo "PDF Converter Service started successfully!"
 echo "Service URL: http://localhost:5001"
 echo "Status endpoint: http://localhost:5001/status"
+echo "Health checks: http://localhost:5001/healthz, http://localhost:5001/readyz"
 echo ""
 echo "To stop the service, run: kill \$(cat pdf_converter/pdf_service.pid)"
\ No newline at end of file